@@ -0,0 +1,64 @@
+from typing import Optional
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from users.cache import UserCache
+from users.models import User
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving the user from `UserCache`, so that only the first
+    request of a user within `AUTH_USER_CACHE_TIMEOUT` queries the database. Cached users
+    are only loaded with the fields `UserCache` keeps.
+
+    With `AUTH_STATELESS_USER`, the user is instead built from the `name` and `email` claims
+    embedded by `CustomTokenObtainPairSerializer`, without any lookup. Such users can't be
+    deactivated before their token expires, and their other fields are loaded on access.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_cache = UserCache()
+
+    def get_user(self, validated_token: Token) -> User:
+        if settings.AUTH_STATELESS_USER:
+            user = self.get_stateless_user(validated_token)
+            if user is not None:
+                return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cached = self.user_cache.get(user_id)
+        if cached is None:
+            user = super().get_user(validated_token)
+            self.user_cache.set(user)
+            return user
+
+        user, password_fingerprint = cached
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != password_fingerprint:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+    @staticmethod
+    def get_stateless_user(validated_token: Token) -> Optional[User]:
+        """
+        Build the user from the token claims, as if it was loaded with only these fields.
+        """
+        try:
+            values = [validated_token[api_settings.USER_ID_CLAIM], validated_token["name"], validated_token["email"]]
+        except KeyError:
+            return None
+        return User.from_db("default", [api_settings.USER_ID_FIELD, "name", "email", "is_active"], [*values, True])
@@ -1,4 +1,10 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import update_last_login
+from rest_framework import exceptions
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from users.backends import aauthenticate
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -13,6 +19,30 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         super().validate(attrs)
 
+        return self.get_token_pair()
+
+    async def avalidate(self):
+        """
+        Validate the credentials and authenticate them without blocking the event loop, for
+        async views. Returns the token pair, like `validated_data` after `is_valid`.
+        """
+        attrs = self.to_internal_value(self.initial_data)
+        self.user = await aauthenticate(
+            self.context.get('request'),
+            **{self.username_field: attrs[self.username_field], 'password': attrs['password']},
+        )
+
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+        if api_settings.UPDATE_LAST_LOGIN:
+            await sync_to_async(update_last_login)(None, self.user)
+
+        return self.get_token_pair()
+
+    def get_token_pair(self):
         token = self.get_token(self.user)
 
         response = {
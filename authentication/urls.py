@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from authentication.views import CustomTokenObtainPairView
+from authentication.views import AsyncTokenObtainPairView, CustomTokenObtainPairView
+
+token_obtain_pair_view = AsyncTokenObtainPairView if settings.AUTH_ASYNC_TOKEN_VIEW else CustomTokenObtainPairView
 
 urlpatterns = [
     path('', lambda request: redirect('schema-swagger-ui', permanent=True)),
-    path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', token_obtain_pair_view.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
@@ -1,6 +1,14 @@
+import json
+
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ParseError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from authentication.serializers import CustomTokenObtainPairSerializer
+from utils.handler import custom_exception_handler
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -11,3 +19,37 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class AsyncTokenObtainPairView(View):
+    """
+    `CustomTokenObtainPairView` for ASGI: the credentials are checked awaiting the password
+    hashing pool, so the event loop keeps serving other requests while they're hashed.
+    Takes the same JSON or form payload and answers like the DRF view, errors included.
+    """
+    http_method_names = ["post"]
+    serializer_class = CustomTokenObtainPairSerializer
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Like DRF's views, token requests authenticate through their credentials alone.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            serializer = self.serializer_class(data=self.get_data(request), context={"request": request})
+            try:
+                data = await serializer.avalidate()
+            except TokenError as e:
+                raise InvalidToken(e.args[0])
+        except Exception as exc:
+            response = custom_exception_handler(exc, {"view": self, "request": request})
+            return JsonResponse(response.data, status=response.status_code)
+        return JsonResponse(data)
+
+    @staticmethod
+    def get_data(request):
+        if request.content_type != "application/json":
+            return request.POST
+        try:
+            return json.loads(request.body)
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
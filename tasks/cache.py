@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class TaskListCache:
+    """
+    Read-through cache for serialized task lists, keyed by user and filter combination.
+
+    Every entry key embeds the owner's current version, so bumping that version makes all
+    of the owner's entries unreachable at once, without scanning keys. Unreachable entries
+    simply age out through their timeout.
+    """
+    VERSION_KEY = "tasks:list:version:{user_id}"
+    ENTRY_KEY = "tasks:list:{user_id}:v{version}:{digest}"
+    HITS_KEY = "tasks:list:hits"
+    MISSES_KEY = "tasks:list:misses"
+
+    def __init__(self, timeout: Optional[int] = None):
+        self.timeout = timeout if timeout is not None else settings.TASKS_LIST_CACHE_TIMEOUT
+
+    @staticmethod
+    def _initial_version() -> int:
+        """
+        Seed versions from the clock so that a version key lost to eviction never
+        resurrects entries written under an older version.
+        """
+        return int(time.time() * 1000)
+
+    def get_version(self, user_id: int) -> int:
+        key = self.VERSION_KEY.format(user_id=user_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, self._initial_version(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Bump the user's version so that none of the cached lists is served again.
+        """
+        key = self.VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, self._initial_version(), timeout=None)
+            cache.incr(key)
+        logger.debug(f"Invalidated cached task lists for user ID {user_id}.")
+
+    def get_or_set(self, user_id: int, filters: Dict, build: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return the cached payload for the user and filters, building and storing it on a miss.
+
+        :return: A tuple with the payload and whether it was a cache hit.
+        """
+        digest = hashlib.md5(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+        key = self.ENTRY_KEY.format(user_id=user_id, version=self.get_version(user_id), digest=digest)
+
+        payload = cache.get(key)
+        if payload is not None:
+            self._count(self.HITS_KEY)
+            return payload, True
+
+        self._count(self.MISSES_KEY)
+        payload = build()
+        cache.set(key, payload, timeout=self.timeout)
+        return payload, False
+
+    def get_stats(self) -> Dict:
+        """
+        Return the hit and miss counters shared by every worker.
+        """
+        counters = cache.get_many([self.HITS_KEY, self.MISSES_KEY])
+        hits = counters.get(self.HITS_KEY, 0)
+        misses = counters.get(self.MISSES_KEY, 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        cache.delete_many([self.HITS_KEY, self.MISSES_KEY])
+
+    @staticmethod
+    def _count(key: str) -> None:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
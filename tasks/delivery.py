@@ -0,0 +1,88 @@
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderDeliveryError(Exception):
+    """
+    Raised by a reminder chunk when some of its emails couldn't be sent, so it is retried.
+    """
+
+
+class SendRateLimiter:
+    """
+    Global cap on the reminder emails sent per second by every worker together, counted
+    in Redis with one key per second. A limit of 0 disables it without touching Redis.
+    """
+    KEY = "tasks:reminders:rate:{second}"
+
+    # Count ARGV[1] sends in the KEYS[1] window and return the window total.
+    ACQUIRE_SCRIPT = """
+    local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if count == tonumber(ARGV[1]) then
+        redis.call('EXPIRE', KEYS[1], 2)
+    end
+    return count
+    """
+
+    def __init__(self, rate: Optional[int] = None, alias: str = "default"):
+        self.rate = settings.TASKS_REMINDER_SEND_RATE if rate is None else rate
+        self.alias = alias
+        self._acquire = None
+
+    def acquire(self) -> None:
+        """
+        Wait until one more email can be sent within the rate.
+        """
+        if not self.rate:
+            return
+        if self._acquire is None:
+            self._acquire = get_redis_connection(self.alias).register_script(self.ACQUIRE_SCRIPT)
+        while True:
+            current = time.time()
+            second = int(current)
+            if self._acquire(keys=[self.KEY.format(second=second)], args=[1]) <= self.rate:
+                return
+            time.sleep(second + 1 - current)
+
+
+class ReminderClaims:
+    """
+    Idempotency keys of reminders, one per task and expiry date, so that a retried chunk
+    or a concurrent run never sends the same reminder twice, even when the reminder was
+    sent but couldn't be marked in the database.
+    """
+    KEY = "tasks:reminders:claim:{task_id}:{expires_at}"
+
+    def __init__(self, timeout: Optional[int] = None, alias: str = "default"):
+        self.timeout = timeout if timeout is not None else settings.TASKS_REMINDER_CLAIM_TIMEOUT
+        self.alias = alias
+
+    def _key(self, task_id: int, expires_at: datetime) -> str:
+        return self.KEY.format(task_id=task_id, expires_at=expires_at.timestamp())
+
+    def claim(self, reminders: List[Tuple[int, datetime]]) -> List[bool]:
+        """
+        Claim the `(task_id, expires_at)` reminders in a single round trip.
+
+        :return: Whether each reminder was claimed, False when it's already claimed.
+        """
+        if not reminders:
+            return []
+        pipeline = get_redis_connection(self.alias).pipeline(transaction=False)
+        for task_id, expires_at in reminders:
+            pipeline.set(self._key(task_id, expires_at), 1, nx=True, ex=self.timeout)
+        return [bool(claimed) for claimed in pipeline.execute()]
+
+    def release(self, reminders: List[Tuple[int, datetime]]) -> None:
+        """
+        Release the claims of reminders that couldn't be sent, so a retry sends them.
+        """
+        if reminders:
+            get_redis_connection(self.alias).delete(*(self._key(*reminder) for reminder in reminders))
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Dict, List
 
 
 class TaskStatus(Enum):
@@ -11,3 +12,35 @@ class TaskStatus(Enum):
     @classmethod
     def choices(cls):
         return [(key.value, key.name.capitalize()) for key in cls]
+
+    @classmethod
+    def terminal_values(cls):
+        """
+        Statuses after which a task no longer expires nor gets reminders.
+        """
+        return [cls.DONE.value, cls.EXPIRED.value, cls.CANCELLED.value]
+
+    @classmethod
+    def transitions(cls) -> Dict[str, List[str]]:
+        """
+        The statuses each status can move to. Done tasks can be reopened and cancelled
+        ones restored, while expired tasks can only be cancelled.
+        """
+        return {
+            cls.CREATED.value: [cls.IN_PROGRESS.value, cls.DONE.value, cls.CANCELLED.value, cls.EXPIRED.value],
+            cls.IN_PROGRESS.value: [cls.DONE.value, cls.CANCELLED.value, cls.EXPIRED.value],
+            cls.DONE.value: [cls.IN_PROGRESS.value],
+            cls.CANCELLED.value: [cls.CREATED.value],
+            cls.EXPIRED.value: [cls.CANCELLED.value],
+        }
+
+    @classmethod
+    def predecessors(cls, status: str) -> List[str]:
+        """
+        The statuses a task can move to `status` from.
+        """
+        return [current for current, following in cls.transitions().items() if status in following]
+
+    @classmethod
+    def can_transition(cls, current: str, status: str) -> bool:
+        return status in cls.transitions()[current]
@@ -0,0 +1,151 @@
+import socket
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.timezone import localtime, now
+
+from tasks.models import Task
+from tasks.tasks import send_expiry_digests
+from users.models import User
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server side that accepts and discards every message.
+    """
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost SMTP sink")
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while (data := self.rfile.readline()) and data != b".\r\n":
+                    pass
+                self.server.messages += 1
+                self.reply("250 OK")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class _SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPSinkHandler)
+        self.messages = 0
+
+
+class _UnsharedClaims:
+    """
+    `ReminderClaims` granting every claim in process, without Redis.
+    """
+
+    def claim(self, reminders):
+        return [True] * len(reminders)
+
+    def release(self, reminders):
+        pass
+
+
+class _Unlimited:
+    """
+    `SendRateLimiter` that never waits, without Redis.
+    """
+
+    def acquire(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the delivery rate of expiry reminders sent one email and connection per task "
+        "with digests sent over a single connection, against a local SMTP sink. "
+        "Tasks are built in memory and never saved; the digests' reminder claims, send rate limit "
+        "and reminded marks are replaced with no-ops, so only delivery is timed and neither Redis "
+        "nor the database is touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owners", type=int, default=200, help="Number of task owners.")
+        parser.add_argument("--tasks-per-owner", type=int, default=5, help="Number of expiring tasks per owner.")
+
+    def handle(self, *args, **options):
+        expires_at = now() + timedelta(hours=1)
+        tasks = []
+        for owner_index in range(options["owners"]):
+            owner = User(id=owner_index + 1, email=f"owner{owner_index}@example.com")
+            tasks += [
+                Task(id=len(tasks) + 1, owner=owner, title=f"Task {index}", expires_at=expires_at)
+                for index in range(options["tasks_per_owner"])
+            ]
+
+        sink = _SMTPSink()
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        smtp_settings = {
+            "EMAIL_BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+            "EMAIL_HOST": "127.0.0.1",
+            "EMAIL_PORT": sink.server_address[1],
+            "EMAIL_HOST_USER": "",
+            "EMAIL_HOST_PASSWORD": "",
+            "EMAIL_USE_TLS": False,
+            "EMAIL_USE_SSL": False,
+            "DEFAULT_FROM_EMAIL": settings.DEFAULT_FROM_EMAIL or "reminders@example.com",
+        }
+        try:
+            with override_settings(**smtp_settings):
+                self._report("per task", len(tasks), sink, lambda: self._send_per_task(tasks))
+                with (
+                    patch("tasks.tasks.ReminderClaims", _UnsharedClaims),
+                    patch("tasks.tasks.SendRateLimiter", _Unlimited),
+                    patch("tasks.tasks.TaskRepository.mark_reminders_sent"),
+                ):
+                    self._report("digest", len(tasks), sink, lambda: send_expiry_digests(tasks))
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+    def _report(self, mode: str, task_count: int, sink: _SMTPSink, send) -> None:
+        sink.messages = 0
+        started = time.perf_counter()
+        send()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{mode:>8}: {sink.messages:>6} emails for {task_count} tasks in {elapsed:7.2f} s, "
+            f"{sink.messages / elapsed:8.1f} emails/s, {task_count / elapsed:8.1f} tasks reminded/s"
+        )
+
+    @staticmethod
+    def _send_per_task(tasks) -> None:
+        """
+        What `send_expiry_reminder` does without digests: an email and a connection per task.
+        """
+        for task in tasks:
+            local_expires_at = localtime(task.expires_at).strftime('%B %d, %Y, at %I:%M %p')
+            send_mail(
+                subject="Task Expiry Reminder",
+                message=f'Your task "{task.title}" is set to expire on {local_expires_at}. ⏰',
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[task.owner.email],
+            )
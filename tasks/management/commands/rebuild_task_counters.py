@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tasks.repository import TaskCounterRepository
+
+
+class Command(BaseCommand):
+    help = "Rebuild the task counters behind the task statistics from the tasks table."
+
+    def handle(self, *args, **options):
+        written = TaskCounterRepository.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} task counters."))
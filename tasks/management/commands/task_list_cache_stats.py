@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tasks.cache import TaskListCache
+
+
+class Command(BaseCommand):
+    help = "Show the hit and miss counters of the task list cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        task_list_cache = TaskListCache()
+        stats = task_list_cache.get_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.2%}"
+        )
+        if options["reset"]:
+            task_list_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
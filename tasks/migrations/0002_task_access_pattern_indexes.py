@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:07
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't run inside a transaction,
+    # so the tasks table stays writable during the build.
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['owner', 'active', '-created_at', '-id'], name='tasks_owner_active_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['owner', 'active', 'status', '-created_at', '-id'], name='tasks_owner_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('active', True), models.Q(('status__in', ['DONE', 'EXPIRED', 'CANCELLED']), _negated=True)), fields=['expires_at'], name='tasks_pending_expiry_idx'),
+        ),
+    ]
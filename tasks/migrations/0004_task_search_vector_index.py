@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:14
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't run inside a transaction,
+    # so the tasks table stays writable during the build.
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0003_task_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tasks_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_search_vector_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('CREATED', 'Created'), ('IN_PROGRESS', 'In_progress'), ('DONE', 'Done'), ('CANCELLED', 'Cancelled'), ('EXPIRED', 'Expired')], max_length=12)),
+                ('active', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Task Counter',
+                'verbose_name_plural': 'Task Counters',
+                'constraints': [models.UniqueConstraint(fields=('owner', 'status', 'active'), name='tasks_counter_unique_key')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=(
+                "INSERT INTO tasks_taskcounter (owner_id, status, active, count) "
+                "SELECT owner_id, status, active, COUNT(*) FROM tasks_task GROUP BY owner_id, status, active"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
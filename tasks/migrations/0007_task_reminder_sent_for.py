@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='reminder_sent_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
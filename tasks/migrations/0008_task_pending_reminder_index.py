@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't run inside a transaction,
+    # so the tasks table stays writable during the build.
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0007_task_reminder_sent_for'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('active', True), models.Q(('status__in', ['DONE', 'EXPIRED', 'CANCELLED']), _negated=True), ('reminder_sent_for__isnull', True)), fields=['expires_at'], name='tasks_pending_reminder_idx'),
+        ),
+    ]
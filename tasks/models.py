@@ -1,6 +1,50 @@
-from django.db import models
+from typing import List, Optional, Set, Tuple
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models
+from django.db.models import Q
+from django.utils.timezone import now
 
 from tasks.enum import TaskStatus
+from utils.exceptions import TaskVersionConflictException
+
+# Text search configuration of `Task.search_vector`; changing it requires a migration.
+SEARCH_CONFIG = "english"
+
+
+class TaskQuerySet(models.QuerySet):
+    def soft_delete(self) -> List[Tuple[int, int, str]]:
+        """
+        Deactivate the active tasks of the queryset with a single UPDATE.
+
+        :return: An `(id, owner_id, status)` tuple per deactivated task.
+        """
+        table = self.model._meta.db_table
+        sql, params = self.filter(active=True).values("id").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET active = false, updated_at = %s, version = version + 1 "
+                f"WHERE active AND id IN ({sql}) RETURNING id, owner_id, status",
+                (now(), *params),
+            )
+            return cursor.fetchall()
+
+    def hard_delete(self) -> List[Tuple[int, int, str, bool]]:
+        """
+        Delete the tasks of the queryset with a single DELETE. Tasks aren't referenced
+        by other models, so there is nothing to collect beforehand.
+
+        :return: An `(id, owner_id, status, active)` tuple per deleted task.
+        """
+        table = self.model._meta.db_table
+        sql, params = self.values("id").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({sql}) RETURNING id, owner_id, status, active",
+                params,
+            )
+            return cursor.fetchall()
 
 
 class Task(models.Model):
@@ -12,14 +56,122 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField(null=True)
     active = models.BooleanField(default=True)
+    version = models.PositiveIntegerField(default=1)
+    # The `expires_at` the owner was last reminded of, cleared when the expiry date changes.
+    reminder_sent_for = models.DateTimeField(null=True, blank=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = TaskQuerySet.as_manager()
+
+    # Values of the tracked fields as last read from or written to the database.
+    _loaded_values: Optional[dict] = None
 
     class Meta:
         verbose_name = "Task"
         verbose_name_plural = "Tasks"
+        indexes = [
+            models.Index(
+                fields=["owner", "active", "-created_at", "-id"],
+                name="tasks_owner_active_created_idx",
+            ),
+            models.Index(
+                fields=["owner", "active", "status", "-created_at", "-id"],
+                name="tasks_owner_status_created_idx",
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=Q(active=True) & ~Q(status__in=TaskStatus.terminal_values()),
+                name="tasks_pending_expiry_idx",
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=(
+                    Q(active=True)
+                    & ~Q(status__in=TaskStatus.terminal_values())
+                    & Q(reminder_sent_for__isnull=True)
+                ),
+                name="tasks_pending_reminder_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="tasks_search_vector_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {}
+        instance.mark_clean()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        self.mark_clean(fields)
+
+    def mark_clean(self, fields: Optional[List[str]] = None) -> None:
+        """
+        Record the current values of the loaded fields, or of `fields`, as their database values.
+        """
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.generated or field.attname in deferred or (fields and field.attname not in fields):
+                continue
+            self._loaded_values[field.attname] = getattr(self, field.attname)
+
+    def get_dirty_fields(self) -> Set[str]:
+        """
+        The loaded fields whose value changed since the task was read or written.
+        """
+        if self._loaded_values is None:
+            return set()
+        return {name for name, value in self._loaded_values.items() if getattr(self, name) != value}
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """
+        Save the task. Updates only write the fields modified since the task was loaded,
+        along with `updated_at` and the bumped version, and are skipped without modifications.
+
+        Updates are a single UPDATE that only applies while the task is still at the version
+        it was loaded at, and raise `TaskVersionConflictException` when it was modified concurrently.
+        """
+        if self._state.adding or self._loaded_values is None:
+            super().save(*args, update_fields=update_fields, **kwargs)
+            self._loaded_values = self._loaded_values or {}
+            self.mark_clean()
+            return
+
+        if update_fields is None:
+            update_fields = self.get_dirty_fields()
+        if not update_fields:
+            return
+        update_fields = set(update_fields)
+        if "expires_at" in update_fields and "reminder_sent_for" not in update_fields:
+            # Re-arm the expiry reminder for the new expiry date.
+            self.reminder_sent_for = None
+            update_fields.add("reminder_sent_for")
+
+        self.updated_at = now()
+        changes = {
+            field.attname: getattr(self, field.attname)
+            for field in (self._meta.get_field(name) for name in update_fields)
+        }
+        changes.update(updated_at=self.updated_at, version=self.version + 1)
+        updated = type(self)._base_manager.using(self._state.db).filter(pk=self.pk, version=self.version).update(
+            **changes
+        )
+        if not updated:
+            raise TaskVersionConflictException(self.pk)
+        self.version += 1
+        self.mark_clean()
+
     def delete(self, hard_delete=False, *args, **kwargs):
         """
         Overwrite the delete method to implement soft delete.
@@ -28,4 +180,25 @@ class Task(models.Model):
             super().delete(*args, **kwargs)
         else:
             self.active = False
-            self.save()
+            self.save(update_fields=["active"])
+
+
+class TaskCounter(models.Model):
+    """
+    Number of tasks per owner, status and activity, maintained in the same transaction as
+    every task write so statistics never need to count the tasks themselves.
+    """
+    owner = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name="task_counters")
+    status = models.CharField(max_length=12, choices=TaskStatus.choices())
+    active = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Task Counter"
+        verbose_name_plural = "Task Counters"
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "status", "active"], name="tasks_counter_unique_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.status} {'active' if self.active else 'inactive'}: {self.count}"
@@ -1,11 +1,14 @@
+import json
 from datetime import timedelta, datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Iterator, Dict
 
-from django.db.models import QuerySet
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
+from django.db import connection, transaction
+from django.db.models import QuerySet, Q, F
 from django.utils.timezone import now, localtime
 
 from tasks.enum import TaskStatus
-from tasks.models import Task
+from tasks.models import Task, TaskCounter, SEARCH_CONFIG
 from users.models import User
 
 
@@ -14,7 +17,8 @@ class TaskRepository:
     def get_tasks_by_user(
             user: User,
             is_active_filter: Optional[bool] = True,
-            status_filter: Optional[TaskStatus] = None
+            status_filter: Optional[TaskStatus] = None,
+            fields: Optional[List[str]] = None
     ) -> QuerySet:
         """
         Fetch tasks for a user with optional filters.
@@ -22,6 +26,8 @@ class TaskRepository:
         :param user: The owner of the tasks.
         :param is_active_filter: A boolean indicating whether to fetch active tasks.
         :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE').
+        :param fields: The only columns to fetch, as tuples in that order. Tasks are
+            loaded as model instances when omitted.
         :return: A QuerySet of tasks.
         """
         tasks = Task.objects.filter(owner=user)
@@ -32,14 +38,138 @@ class TaskRepository:
         if status_filter:
             tasks = tasks.filter(status=status_filter)
 
+        if fields:
+            tasks = tasks.values_list(*fields)
+
         return tasks
 
     @staticmethod
-    def get_task_by_id(task_id: int) -> Optional[Task]:
+    def get_tasks_page(
+            user: User,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[TaskStatus] = None,
+            limit: int = 50,
+            after: Optional[Tuple[datetime, int]] = None,
+            fields: Optional[List[str]] = None
+    ) -> QuerySet:
+        """
+        Fetch one keyset page of a user's tasks, newest first.
+
+        :param user: The owner of the tasks.
+        :param is_active_filter: A boolean indicating whether to fetch active tasks.
+        :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE').
+        :param limit: The maximum number of tasks to return.
+        :param after: The `(created_at, id)` position of the last task of the previous page.
+        :param fields: The only columns to fetch, as tuples in that order followed by the
+            `created_at` and `id` keyset columns. Tasks are loaded as model instances when omitted.
+        :return: A QuerySet of at most `limit` tasks ordered by `(created_at, id)` descending.
+        """
+        tasks = TaskRepository.get_tasks_by_user(user, is_active_filter, status_filter)
+
+        if after is not None:
+            created_at, task_id = after
+            # The OR alone is only a filter, the redundant bound lets the index start the scan at the cursor.
+            tasks = tasks.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=task_id),
+                created_at__lte=created_at,
+            )
+
+        if fields:
+            tasks = tasks.values_list(*fields, "created_at", "id")
+
+        return tasks.order_by("-created_at", "-id")[:limit]
+
+    @staticmethod
+    def iterate_tasks_by_user(
+            user: User,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[TaskStatus] = None,
+            chunk_size: int = 2000,
+            fields: Optional[List[str]] = None
+    ) -> Iterator:
+        """
+        Lazily iterate over a user's tasks, newest first, through a server-side cursor
+        that fetches `chunk_size` rows at a time. Yields tuples of `fields` when given.
+        """
+        tasks = TaskRepository.get_tasks_by_user(user, is_active_filter, status_filter, fields)
+        return tasks.order_by("-created_at", "-id").iterator(chunk_size=chunk_size)
+
+    @staticmethod
+    def search_tasks(
+            user: User,
+            query: str,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[TaskStatus] = None,
+            limit: int = 50,
+            fields: Optional[List[str]] = None
+    ) -> QuerySet:
+        """
+        Full-text search over the title and description of a user's tasks, through the GIN index
+        on `search_vector`.
+
+        :param user: The owner of the tasks.
+        :param query: The search terms, in web search syntax (quoted phrases, `or`, `-excluded`).
+        :param is_active_filter: A boolean indicating whether to fetch active tasks.
+        :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE').
+        :param limit: The maximum number of tasks to return.
+        :param fields: The only columns to fetch, as tuples in that order followed by the
+            annotations. Tasks are loaded as model instances when omitted.
+        :return: A QuerySet of the best matching tasks, annotated with their `rank` and with
+            highlighted `title_highlight` and `description_highlight` excerpts.
+        """
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        tasks = TaskRepository.get_tasks_by_user(user, is_active_filter, status_filter)
+
+        tasks = tasks.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F("search_vector"), search_query),
+            title_highlight=SearchHeadline("title", search_query, config=SEARCH_CONFIG, highlight_all=True),
+            description_highlight=SearchHeadline("description", search_query, config=SEARCH_CONFIG),
+        )
+
+        if fields:
+            tasks = tasks.values_list(*fields, "rank", "title_highlight", "description_highlight")
+
+        return tasks.order_by("-rank", "-created_at", "-id")[:limit]
+
+    @staticmethod
+    def estimate_count(queryset: QuerySet) -> int:
+        """
+        Estimate the number of rows of a QuerySet from the planner statistics,
+        without scanning the table like `count()` does.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @staticmethod
+    def get_task_for_owner(
+            task_id: int,
+            owner_id: int,
+            fields: Optional[List[str]] = None
+    ) -> Tuple[Optional[Task], bool]:
         """
-        Fetch a task by ID, including inactive tasks.
+        Fetch a task by ID on behalf of its owner, including inactive tasks, in a single query
+        that compares owner IDs instead of loading the owner.
+
+        :param task_id: The ID of the task.
+        :param owner_id: The ID of the user the task must belong to.
+        :param fields: The only columns to load besides the owner and `updated_at`, all of them when omitted.
+        :return: A tuple with the task, None when it doesn't exist or belongs to another user,
+            and whether it exists.
         """
-        return Task.objects.filter(id=task_id).first()
+        tasks = Task.objects.filter(id=task_id)
+        if fields:
+            tasks = tasks.only(*fields, "owner", "updated_at")
+        task = tasks.first()
+        if task is None:
+            return None, False
+        if task.owner_id != owner_id:
+            return None, True
+        return task, True
 
     @staticmethod
     def create_task(
@@ -57,46 +187,355 @@ class TaskRepository:
         )
 
     @staticmethod
-    def update_task(task: Task, **kwargs) -> Task:
+    def bulk_create_tasks(tasks: List[Task], batch_size: int = 500) -> List[Task]:
+        """
+        Insert new tasks with one multi-row INSERT per `batch_size` tasks, setting their IDs.
+        """
+        return Task.objects.bulk_create(tasks, batch_size=batch_size)
+
+    @staticmethod
+    def update_task(task: Task, version: Optional[int] = None, **kwargs) -> Optional[Task]:
         """
-        Update an existing task.
+        Update an existing task with a single conditional UPDATE of its modified fields, which
+        only applies while the task is still at `version` and bumps it.
+
+        :param task: The task to update.
+        :param version: The version the changes are based on, the loaded one when omitted.
+        :return: The updated task, or None when the task was modified concurrently.
         """
+        expected_version = task.version if version is None else version
         for key, value in kwargs.items():
             setattr(task, key, value)
-        task.save()
+
+        changes = {name: getattr(task, name) for name in task.get_dirty_fields()}
+        if not changes:
+            return task if expected_version == task.version else None
+        if "expires_at" in changes:
+            # Re-arm the expiry reminder for the new expiry date.
+            task.reminder_sent_for = changes["reminder_sent_for"] = None
+
+        changes["updated_at"] = now()
+        updated = Task.objects.filter(id=task.id, version=expected_version).update(
+            version=F("version") + 1, **changes
+        )
+        if not updated:
+            return None
+
+        task.version = expected_version + 1
+        task.updated_at = changes["updated_at"]
+        task.mark_clean()
         return task
 
     @staticmethod
-    def get_tasks_expiring_soon(hours: int) -> List[Task]:
+    def get_tasks_expiring_soon(hours: int, task_ids: Optional[List[int]] = None) -> List[Task]:
         """
-        Fetch tasks that are set to expire within the next `hours`, excluding tasks
-        with a status of DONE, EXPIRED or CANCELLED.
+        Fetch active tasks that are set to expire within the next `hours` and whose owner
+        wasn't reminded of that expiry yet, excluding tasks with a status of DONE, EXPIRED
+        or CANCELLED, along with their owner.
+
+        :param task_ids: Only consider these tasks, all of them when omitted.
         """
         current_time = localtime(now())
         three_hours_later = current_time + timedelta(hours=hours)
 
-        return Task.objects.filter(
+        tasks = Task.objects.filter(
             expires_at__lte=three_hours_later,
             expires_at__gt=current_time,
+            active=True,
+            reminder_sent_for__isnull=True,
         ).exclude(
-            status__in=[TaskStatus.DONE.value, TaskStatus.EXPIRED.value, TaskStatus.CANCELLED.value]
+            status__in=TaskStatus.terminal_values()
+        ).select_related("owner")
+        if task_ids is not None:
+            tasks = tasks.filter(id__in=task_ids)
+        return tasks
+
+    @staticmethod
+    def iterate_tasks_expiring_soon(
+            hours: int,
+            chunk_size: int = 2000,
+            task_ids: Optional[List[int]] = None
+    ) -> Iterator[Task]:
+        """
+        Lazily iterate over the tasks expiring within the next `hours` along with their owner,
+        grouped by owner and soonest expiry first, through a server-side cursor that fetches
+        `chunk_size` rows at a time.
+        """
+        tasks = TaskRepository.get_tasks_expiring_soon(hours, task_ids)
+        return tasks.order_by("owner_id", "expires_at").iterator(chunk_size=chunk_size)
+
+    @staticmethod
+    def iterate_task_ids_expiring_soon(
+            hours: int,
+            chunk_size: int = 2000,
+            task_ids: Optional[List[int]] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Lazily iterate over the `(owner_id, id)` of the tasks expiring within the next `hours`,
+        grouped by owner.
+        """
+        tasks = TaskRepository.get_tasks_expiring_soon(hours, task_ids).select_related(None)
+        return tasks.order_by("owner_id", "id").values_list("owner_id", "id").iterator(chunk_size=chunk_size)
+
+    @staticmethod
+    def iterate_task_timers(
+            task_ids: Optional[List[int]] = None,
+            chunk_size: int = 2000
+    ) -> Iterator[Tuple[int, datetime, Optional[datetime]]]:
+        """
+        Lazily iterate over the `(id, expires_at, reminder_sent_for)` of the active tasks
+        that still expire, the ones the timer index schedules.
+
+        :param task_ids: Only consider these tasks, all of them when omitted.
+        """
+        tasks = Task.objects.filter(active=True, expires_at__isnull=False).exclude(
+            status__in=TaskStatus.terminal_values()
         )
+        if task_ids is not None:
+            tasks = tasks.filter(id__in=task_ids)
+        return tasks.values_list("id", "expires_at", "reminder_sent_for").iterator(chunk_size=chunk_size)
 
     @staticmethod
     def get_expired_tasks() -> List[Task]:
         """
-        Fetch tasks whose expiry date has passed and are still active.
+        Fetch tasks whose expiry date has passed and are still active, excluding tasks
+        with a status of DONE, EXPIRED or CANCELLED.
         """
         return Task.objects.filter(
             expires_at__lt=now(),
             active=True
-        ).exclude(status=TaskStatus.EXPIRED.value)
+        ).exclude(status__in=TaskStatus.terminal_values())
 
     @staticmethod
-    def update_task_status(task: Task, status: TaskStatus) -> Task:
+    def mark_reminders_sent(reminders: List[Tuple[int, datetime]]) -> int:
         """
-        Update the status of a task and save it.
+        Record in a single UPDATE that the owners of tasks were reminded of their expiry.
+        Tasks whose expiry date changed since are left to be reminded of the new one.
+
+        :param reminders: The `(task_id, expires_at)` of each reminded task.
+        :return: The number of tasks marked.
         """
-        task.status = status
-        task.save()
-        return task
+        if not reminders:
+            return 0
+        task_ids, expiries = zip(*reminders)
+        table = Task._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS task SET reminder_sent_for = reminded.expires_at "
+                f"FROM unnest(%s::bigint[], %s::timestamptz[]) AS reminded (id, expires_at) "
+                f"WHERE task.id = reminded.id AND task.expires_at = reminded.expires_at",
+                (list(task_ids), list(expiries)),
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def expire_tasks_batch(
+            batch_size: int,
+            task_ids: Optional[List[int]] = None
+    ) -> List[Tuple[int, int, str, bool]]:
+        """
+        Mark up to `batch_size` of the tasks whose expiry date has passed as expired, with a
+        single UPDATE. The oldest expiries go first, and tasks locked by another transaction
+        are skipped rather than waited for.
+
+        :param task_ids: Only consider these tasks, all of them when omitted.
+        :return: An `(id, owner_id, previous_status, active)` tuple per expired task.
+        """
+        batch = TaskRepository.get_expired_tasks()
+        if task_ids is not None:
+            batch = batch.filter(id__in=task_ids)
+        batch = batch.order_by("expires_at").values("id", "status")
+        sql, params = batch.select_for_update(skip_locked=True)[:batch_size].query.sql_with_params()
+        table = Task._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH batch AS ({sql}) "
+                f"UPDATE {table} AS task SET status = %s, updated_at = %s, version = task.version + 1 "
+                f"FROM batch WHERE task.id = batch.id "
+                f"RETURNING task.id, task.owner_id, batch.status, task.active",
+                (*params, TaskStatus.EXPIRED.value, now()),
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def update_task_status(task: Task, status: TaskStatus) -> Optional[Task]:
+        """
+        Update the status of a task unless it was modified since it was loaded.
+
+        :return: The updated task, or None when the task was modified concurrently.
+        """
+        return TaskRepository.update_task(task, status=status)
+
+    @staticmethod
+    def bulk_update_status(
+            user: User,
+            task_ids: List[int],
+            status: TaskStatus
+    ) -> List[Tuple[int, Optional[int], Optional[str], Optional[bool], bool]]:
+        """
+        Set the status of many of a user's tasks in a single statement. The user's tasks
+        among `task_ids` are locked, those allowed to move to `status` are updated, and every
+        requested ID is reported along with what the statement found.
+
+        :param user: The owner of the tasks. Tasks of other users are left untouched.
+        :param task_ids: The IDs of the tasks to update.
+        :param status: The new status.
+        :return: A `(task_id, owner_id, previous_status, active, updated)` tuple per requested ID,
+            where `owner_id` is None for missing tasks.
+        """
+        table = Task._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH targets AS ("
+                f"  SELECT id, status, active FROM {table}"
+                f"  WHERE id = ANY(%(ids)s) AND owner_id = %(owner_id)s FOR UPDATE"
+                f"), updated AS ("
+                f"  UPDATE {table} AS task SET status = %(status)s, updated_at = %(updated_at)s, version = task.version + 1"
+                f"  FROM targets"
+                f"  WHERE task.id = targets.id AND targets.status = ANY(%(predecessors)s)"
+                f"  RETURNING task.id"
+                f") "
+                f"SELECT requested.id, task.owner_id, COALESCE(targets.status, task.status), "
+                f"COALESCE(targets.active, task.active), updated.id IS NOT NULL "
+                f"FROM unnest(%(ids)s::bigint[]) WITH ORDINALITY AS requested (id, position) "
+                f"LEFT JOIN {table} AS task ON task.id = requested.id "
+                f"LEFT JOIN targets ON targets.id = requested.id "
+                f"LEFT JOIN updated ON updated.id = requested.id "
+                f"ORDER BY requested.position",
+                {
+                    "ids": list(task_ids),
+                    "owner_id": user.id,
+                    "status": status,
+                    "predecessors": TaskStatus.predecessors(status),
+                    "updated_at": now(),
+                },
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def transition_task(
+            task_id: int,
+            owner_id: int,
+            status: TaskStatus
+    ) -> Tuple[Optional[str], Optional[Task]]:
+        """
+        Move a task of a user to `status` in a single statement, provided its current
+        status allows it, and read it back. Only the user's own task is locked, so other
+        users' tasks can't be locked through their IDs.
+
+        :param task_id: The ID of the task.
+        :param owner_id: The ID of the user the task must belong to.
+        :param status: The new status.
+        :return: A tuple with the status of the task before the statement, None when the user
+            has no such task, and the transitioned task, None when it wasn't updated.
+        """
+        table = Task._meta.db_table
+        # In model order, as `from_db` expects for partially loaded instances.
+        returned_fields = ["id", "owner_id", "title", "description", "status", "updated_at", "expires_at",
+                           "active", "version", "reminder_sent_for"]
+        returning = ", ".join(f"task.{field}" for field in returned_fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH target AS ("
+                f"  SELECT id, status FROM {table} WHERE id = %(id)s AND owner_id = %(owner_id)s FOR UPDATE"
+                f"), updated AS ("
+                f"  UPDATE {table} AS task SET status = %(status)s, updated_at = %(updated_at)s, version = task.version + 1"
+                f"  FROM target"
+                f"  WHERE task.id = target.id AND target.status = ANY(%(predecessors)s)"
+                f"  RETURNING {returning}"
+                f") "
+                f"SELECT target.status, updated.* FROM target LEFT JOIN updated ON true",
+                {
+                    "id": task_id,
+                    "owner_id": owner_id,
+                    "status": status,
+                    "predecessors": TaskStatus.predecessors(status),
+                    "updated_at": now(),
+                },
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            return None, None
+        previous_status, *values = row
+        if values[0] is None:
+            return previous_status, None
+        return previous_status, Task.from_db(connection.alias, returned_fields, values)
+
+    @staticmethod
+    def soft_delete_tasks(user: User, task_ids: List[int]) -> List[Tuple[int, int, str]]:
+        """
+        Deactivate the active tasks of a user among `task_ids` with a single UPDATE.
+
+        :return: An `(id, owner_id, status)` tuple per deactivated task.
+        """
+        return Task.objects.filter(owner=user, id__in=task_ids).soft_delete()
+
+    @staticmethod
+    def hard_delete_tasks(user: User, task_ids: List[int]) -> List[Tuple[int, int, str, bool]]:
+        """
+        Delete the tasks of a user among `task_ids` with a single DELETE.
+
+        :return: An `(id, owner_id, status, active)` tuple per deleted task.
+        """
+        return Task.objects.filter(owner=user, id__in=task_ids).hard_delete()
+
+    @staticmethod
+    def get_task_owners(task_ids: List[int]) -> Dict[int, int]:
+        """
+        Map the existing tasks among `task_ids` to the ID of their owner.
+        """
+        return dict(Task.objects.filter(id__in=task_ids).values_list("id", "owner_id"))
+
+
+class TaskCounterRepository:
+    @staticmethod
+    def apply_deltas(deltas: Dict[Tuple[int, str, bool], int]) -> None:
+        """
+        Add deltas to the task counters in a single upsert, creating missing counters.
+        Must run in the transaction of the task writes the deltas account for.
+
+        :param deltas: The change of each counter, keyed by `(owner_id, status, active)`.
+        """
+        rows = sorted((key, delta) for key, delta in deltas.items() if delta)
+        if not rows:
+            return
+
+        table = TaskCounter._meta.db_table
+        values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+        params = [value for (owner_id, status, active), delta in rows for value in (owner_id, status, active, delta)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (owner_id, status, active, count) VALUES {values} "
+                f"ON CONFLICT (owner_id, status, active) DO UPDATE SET count = {table}.count + EXCLUDED.count",
+                params,
+            )
+
+    @staticmethod
+    def get_counters_by_user(user: User) -> QuerySet:
+        """
+        Fetch the non-empty task counters of a user.
+        """
+        return TaskCounter.objects.filter(owner=user, count__gt=0)
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild() -> int:
+        """
+        Recompute every task counter from the tasks table.
+
+        The counters table is locked for the whole rebuild, so writers that inserted tasks
+        concurrently wait for it before applying their own deltas on top of the rebuilt counts.
+
+        :return: The number of counters written.
+        """
+        table = TaskCounter._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} (owner_id, status, active, count) "
+                f"SELECT owner_id, status, active, COUNT(*) FROM {Task._meta.db_table} "
+                f"GROUP BY owner_id, status, active"
+            )
+            return cursor.rowcount
@@ -1,23 +1,153 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from tasks.models import Task
 from tasks.enum import TaskStatus
+from utils.compiled_serializers import CompiledSerializer
+from utils.pagination import CursorField
+
+# Upper bound of compiled serializers kept, one per serializer class, fieldset and timezone.
+_COMPILED_SERIALIZERS_CACHE_SIZE = 256
+
+
+class SparseFieldsetField(serializers.Field):
+    """
+    Query parameter listing a comma-separated subset of a serializer's fields.
+    The `id` is always part of the fieldset, and fields keep the serializer order.
+    """
+    default_error_messages = {
+        "invalid": "Unknown fields: {fields}. Allowed fields are: {allowed}.",
+    }
+
+    def __init__(self, allowed, **kwargs):
+        self.allowed = list(allowed)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        requested = {field.strip() for field in str(data).split(",") if field.strip()}
+        unknown = requested - set(self.allowed)
+        if unknown:
+            self.fail("invalid", fields=", ".join(sorted(unknown)), allowed=", ".join(self.allowed))
+        return [field for field in self.allowed if field in requested or field == "id"]
+
+    def to_representation(self, value):
+        return ",".join(value)
+
+
+class SparseFieldsetModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that only emits the subset of its fields passed as `fields`.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def compile(cls, fields=None) -> CompiledSerializer:
+        """
+        Get the read-only fast path of the serializer, restricted to `fields` when given.
+
+        It's built once per fieldset and active timezone, which it resolves when built, and
+        reused across requests along with its memoized representations.
+        """
+        return _compile(cls, None if fields is None else tuple(fields), timezone.get_current_timezone_name())
+
 
+@lru_cache(maxsize=_COMPILED_SERIALIZERS_CACHE_SIZE)
+def _compile(serializer_class, fields, timezone_name) -> CompiledSerializer:
+    return CompiledSerializer(serializer_class(fields=fields))
 
-class TaskResponseSerializer(serializers.ModelSerializer):
+
+class TaskResponseSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Task
         fields = ["id", "title", "status", "expires_at"]
 
 
-class TaskDetailSerializer(serializers.ModelSerializer):
+class TaskSearchResultSerializer(TaskResponseSerializer):
+    rank = serializers.FloatField(read_only=True)
+    title_highlight = serializers.CharField(read_only=True)
+    description_highlight = serializers.CharField(read_only=True)
+
+    class Meta(TaskResponseSerializer.Meta):
+        fields = TaskResponseSerializer.Meta.fields + ["rank", "title_highlight", "description_highlight"]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        if fields is not None:
+            fields = [*fields, "rank", "title_highlight", "description_highlight"]
+        super().__init__(*args, fields=fields, **kwargs)
+
+
+class TaskDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Task
-        fields = ["id", "title", "description", "status", "expires_at"]
+        fields = ["id", "title", "description", "status", "expires_at", "version"]
+
+
+class TaskDetailQuerySerializer(serializers.Serializer):
+    fields = SparseFieldsetField(allowed=TaskDetailSerializer.Meta.fields, required=False)
 
 
 class TaskFilterSerializer(serializers.Serializer):
     is_active = serializers.BooleanField(required=False, default=True)
     status = serializers.ChoiceField(choices=TaskStatus.choices(), required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=settings.TASKS_PAGE_MAX_LIMIT)
+    cursor = CursorField(required=False)
+    include_total = serializers.BooleanField(required=False, default=False)
+    stream = serializers.BooleanField(required=False, default=False)
+    fields = SparseFieldsetField(allowed=TaskResponseSerializer.Meta.fields, required=False)
+    q = serializers.CharField(required=False, max_length=256)
+
+    def validate(self, attrs):
+        if attrs.get("stream") and ("limit" in attrs or "cursor" in attrs):
+            raise serializers.ValidationError("Streaming returns the full list and can't be paginated.")
+        if "q" in attrs and (attrs.get("stream") or "cursor" in attrs):
+            raise serializers.ValidationError("Search results are ranked and can't be streamed nor paginated.")
+        return attrs
+
+    @property
+    def is_paginated(self) -> bool:
+        """
+        Whether the client opted into cursor pagination by sending `limit` or `cursor`.
+        """
+        return "limit" in self.validated_data or "cursor" in self.validated_data
+
+
+class TaskStatsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    active = serializers.IntegerField()
+    inactive = serializers.IntegerField()
+    by_status = serializers.DictField(child=serializers.IntegerField())
+    active_by_status = serializers.DictField(child=serializers.IntegerField())
+
+
+class TaskBulkCreateListSerializer(serializers.ListSerializer):
+    """
+    List serializer validating each task on its own: invalid items are reported in
+    `item_errors` instead of failing the whole list, and `validated_data` holds the
+    valid items as `(index, attrs)` pairs.
+    """
+
+    def to_internal_value(self, data):
+        self.item_errors = []
+        valid_items = []
+        for index, item in enumerate(super().to_internal_value(data)):
+            if isinstance(item, serializers.ValidationError):
+                self.item_errors.append({"index": index, "errors": item.detail})
+            else:
+                valid_items.append((index, item))
+        return valid_items
+
+    def run_child_validation(self, data):
+        try:
+            return super().run_child_validation(data)
+        except serializers.ValidationError as exc:
+            return exc
 
 
 class TaskCreateSerializer(serializers.Serializer):
@@ -26,9 +156,67 @@ class TaskCreateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=TaskStatus.choices(), required=False)
     expires_at = serializers.DateTimeField(required=False, allow_null=True)
 
+    class Meta:
+        list_serializer_class = TaskBulkCreateListSerializer
+
+
+class TaskBulkCreatedSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    id = serializers.IntegerField()
+
+
+class TaskBulkErrorSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    errors = serializers.DictField()
+
+
+class TaskBulkCreateResultSerializer(serializers.Serializer):
+    created = TaskBulkCreatedSerializer(many=True)
+    errors = TaskBulkErrorSerializer(many=True)
+
+
+class TaskBulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=settings.TASKS_BULK_MAX_ITEMS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class TaskBulkStatusSerializer(TaskBulkIdsSerializer):
+    status = serializers.ChoiceField(choices=TaskStatus.choices())
+
+
+class TaskBulkStatusResultSerializer(serializers.Serializer):
+    changed = serializers.ListField(child=serializers.IntegerField())
+    unchanged = serializers.ListField(child=serializers.IntegerField())
+    rejected = serializers.ListField(child=serializers.IntegerField())
+    missing = serializers.ListField(child=serializers.IntegerField())
+    unauthorized = serializers.ListField(child=serializers.IntegerField())
+
+
+class TaskBulkDeleteSerializer(TaskBulkIdsSerializer):
+    hard_delete = serializers.BooleanField(required=False, default=False)
+
+
+class TaskBulkDeleteResultSerializer(serializers.Serializer):
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    missing = serializers.ListField(child=serializers.IntegerField())
+    unauthorized = serializers.ListField(child=serializers.IntegerField())
+
+
+class TaskTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=TaskStatus.choices())
+
 
 class TaskUpdateSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255, required=False)
     description = serializers.CharField(required=False)
     status = serializers.ChoiceField(choices=TaskStatus.choices(), required=False)
     expires_at = serializers.DateTimeField(required=False, allow_null=True)
+    version = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="The version the changes are based on. The update is rejected with 409 if the task changed since.",
+    )
@@ -1,12 +1,23 @@
 import logging
-from typing import Optional, List, Dict
+from collections import Counter
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Iterator, Iterable, Union
 
+from django.conf import settings
 from django.db import transaction
 
+from tasks.cache import TaskListCache
+from tasks.enum import TaskStatus
 from tasks.models import Task
-from tasks.repository import TaskRepository
+from tasks.repository import TaskRepository, TaskCounterRepository
+from tasks.timers import TaskTimerIndex, TaskTimer
 from users.models import User
-from utils.exceptions import TaskNotFoundException, TaskUnauthorizedAccessException
+from utils.exceptions import (
+    TaskNotFoundException,
+    TaskUnauthorizedAccessException,
+    TaskVersionConflictException,
+    TaskInvalidTransitionException,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,39 +26,157 @@ class TaskService:
     def __init__(
         self,
         task_repository: Optional[TaskRepository] = None,
+        task_list_cache: Optional[TaskListCache] = None,
+        task_counter_repository: Optional[TaskCounterRepository] = None,
+        task_timer_index: Optional[TaskTimerIndex] = None,
     ):
         self.task_repository = task_repository or TaskRepository()
+        self.task_list_cache = task_list_cache or TaskListCache()
+        self.task_counter_repository = task_counter_repository or TaskCounterRepository()
+        self.task_timer_index = task_timer_index or TaskTimerIndex()
+        # Tasks already loaded by this service, by ID. Views build a service per request,
+        # so a task is read at most once per request.
+        self._identity_map: Dict[int, Task] = {}
 
     def get_tasks(
             self,
             user: User,
             is_active_filter: Optional[bool] = True,
-            status_filter: Optional[str] = None
-    ) -> List[Task]:
+            status_filter: Optional[str] = None,
+            fields: Optional[List[str]] = None
+    ) -> List:
         """
         Fetch tasks for a user based on filters.
 
         :param user: The owner of the tasks.
         :param is_active_filter: A boolean indicating whether to fetch active tasks.
         :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE', 'EXPIRED').
+        :param fields: The only task fields to fetch, as tuples in that order. Tasks are
+            loaded as model instances when omitted.
         :return: A list of tasks.
         """
         logger.info(
             f"Fetching tasks for user ID: {user.id} "
             f"with is_active_filter: {is_active_filter}, status_filter: {status_filter}."
         )
-        tasks = self.task_repository.get_tasks_by_user(user, is_active_filter, status_filter)
+        tasks = self.task_repository.get_tasks_by_user(user, is_active_filter, status_filter, fields)
         return list(tasks)
 
-    def get_task_details(self, task_id: int, user: User) -> Task:
+    def get_tasks_page(
+            self,
+            user: User,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[str] = None,
+            limit: Optional[int] = None,
+            cursor: Optional[Tuple[datetime, int]] = None,
+            include_total: bool = False,
+            fields: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Fetch one keyset page of tasks for a user based on filters.
+
+        :param user: The owner of the tasks.
+        :param is_active_filter: A boolean indicating whether to fetch active tasks.
+        :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE', 'EXPIRED').
+        :param limit: The page size, defaults to `TASKS_PAGE_DEFAULT_LIMIT`.
+        :param cursor: The `(created_at, id)` position returned as `next_cursor` by the previous page.
+        :param include_total: Whether to include an estimated total from the planner statistics.
+        :param fields: The only task fields to fetch, as tuples in that order followed by the
+            keyset columns. Tasks are loaded as model instances when omitted.
+        :return: A dict with the page `results`, the `next_cursor` and the `estimated_total`.
+        """
+        limit = limit or settings.TASKS_PAGE_DEFAULT_LIMIT
+        logger.info(
+            f"Fetching task page for user ID: {user.id} "
+            f"with is_active_filter: {is_active_filter}, status_filter: {status_filter}, "
+            f"limit: {limit}, cursor: {cursor}."
+        )
+        tasks = list(
+            self.task_repository.get_tasks_page(user, is_active_filter, status_filter, limit + 1, cursor, fields)
+        )
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_cursor = (last[-2], last[-1]) if fields else (last.created_at, last.id)
+
+        estimated_total = None
+        if include_total:
+            estimated_total = self.task_repository.estimate_count(
+                self.task_repository.get_tasks_by_user(user, is_active_filter, status_filter)
+            )
+
+        return {"results": tasks, "next_cursor": next_cursor, "estimated_total": estimated_total}
+
+    def search_tasks(
+            self,
+            user: User,
+            query: str,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[str] = None,
+            limit: Optional[int] = None,
+            fields: Optional[List[str]] = None
+    ) -> List:
+        """
+        Search a user's tasks by title and description, best matches first.
+
+        :param user: The owner of the tasks.
+        :param query: The search terms.
+        :param is_active_filter: A boolean indicating whether to fetch active tasks.
+        :param status_filter: The status of the task (e.g., 'TODO', 'IN_PROGRESS', 'DONE', 'EXPIRED').
+        :param limit: The maximum number of results, defaults to `TASKS_PAGE_DEFAULT_LIMIT`.
+        :param fields: The only task fields to fetch, as tuples in that order followed by the
+            annotations. Tasks are loaded as model instances when omitted.
+        :return: A list of tasks annotated with their rank and highlighted excerpts.
+        """
+        limit = limit or settings.TASKS_PAGE_DEFAULT_LIMIT
+        logger.info(
+            f"Searching tasks for user ID: {user.id} with query: {query!r}, "
+            f"is_active_filter: {is_active_filter}, status_filter: {status_filter}, limit: {limit}."
+        )
+        tasks = self.task_repository.search_tasks(user, query, is_active_filter, status_filter, limit, fields)
+        return list(tasks)
+
+    def iterate_tasks(
+            self,
+            user: User,
+            is_active_filter: Optional[bool] = True,
+            status_filter: Optional[str] = None,
+            fields: Optional[List[str]] = None
+    ) -> Iterator:
+        """
+        Lazily iterate over every task of a user matching the filters, in chunks of
+        `TASKS_STREAM_CHUNK_SIZE` rows, so memory stays flat regardless of the list size.
+        """
+        logger.info(
+            f"Streaming tasks for user ID: {user.id} "
+            f"with is_active_filter: {is_active_filter}, status_filter: {status_filter}."
+        )
+        return self.task_repository.iterate_tasks_by_user(
+            user, is_active_filter, status_filter, chunk_size=settings.TASKS_STREAM_CHUNK_SIZE, fields=fields
+        )
+
+    def get_task_details(self, task_id: int, user: User, fields: Optional[List[str]] = None) -> Task:
+        """
+        Fetch a task of the authenticated user, reusing it when this service already loaded
+        it with the requested fields.
+
+        :param fields: The only task fields to load, all of them when omitted.
+        """
+        task = self._identity_map.get(task_id)
+        if task is not None and task.owner_id == user.id and not self._is_deferred(task, fields):
+            return task
+
         logger.info(f"Fetching task with ID: {task_id} for user ID: {user.id}.")
-        task = self.task_repository.get_task_by_id(task_id)
-        if not task:
+        task, exists = self.task_repository.get_task_for_owner(task_id, user.id, fields)
+        if not exists:
             logger.error(f"Task with ID {task_id} not found.")
             raise TaskNotFoundException(task_id)
-        if task.owner != user:
+        if task is None:
             logger.error(f"Unauthorized access to task ID {task_id} by user ID {user.id}.")
             raise TaskUnauthorizedAccessException()
+        self._identity_map[task_id] = task
         return task
 
     @transaction.atomic
@@ -59,12 +188,38 @@ class TaskService:
             logger.info(f"Creating task for user ID {user.id} with data: {data}")
             data["owner"] = user
             task = self.task_repository.create_task(**data)
+            self.task_counter_repository.apply_deltas({(user.id, task.status, task.active): 1})
+            self._invalidate_cached_lists(user.id)
+            self._schedule_timers([task])
             logger.info(f"Successfully created task ID {task.id} for user ID {user.id}")
             return task
         except Exception as e:
             logger.error(f"Failed to create task for user ID {user.id}: {str(e)}")
             raise
 
+    @transaction.atomic
+    def bulk_create_tasks(self, items: List[Dict], user: User) -> List[Task]:
+        """
+        Create many tasks for the authenticated user in a single transaction, inserting them
+        in batches of `TASKS_BULK_CREATE_BATCH_SIZE`.
+
+        :param items: The validated data of each task.
+        :return: The created tasks, in the order of `items`.
+        """
+        try:
+            logger.info(f"Bulk creating {len(items)} tasks for user ID {user.id}.")
+            tasks = self.task_repository.bulk_create_tasks(
+                [Task(owner=user, **data) for data in items], batch_size=settings.TASKS_BULK_CREATE_BATCH_SIZE
+            )
+            self.task_counter_repository.apply_deltas(Counter((user.id, task.status, task.active) for task in tasks))
+            self._invalidate_cached_lists(user.id)
+            self._schedule_timers(tasks)
+            logger.info(f"Successfully created {len(tasks)} tasks for user ID {user.id}")
+            return tasks
+        except Exception as e:
+            logger.error(f"Failed to bulk create tasks for user ID {user.id}: {str(e)}")
+            raise
+
     @transaction.atomic
     def update_task(self, task_id: int, data: Dict, user: User) -> Task:
         """
@@ -73,26 +228,271 @@ class TaskService:
         try:
             task = self.get_task_details(task_id, user)
             logger.info(f"Updating task ID {task_id} for user ID {user.id} with data: {data}")
+            previous_key = (user.id, task.status, task.active)
+            new_status = data.get("status", task.status)
+            if new_status != task.status and not TaskStatus.can_transition(task.status, new_status):
+                logger.error(f"Invalid transition of task ID {task_id} from {task.status} to {new_status}.")
+                raise TaskInvalidTransitionException(task_id, task.status, new_status)
             updated_task = self.task_repository.update_task(task, **data)
+            if updated_task is None:
+                logger.error(f"Conflicting update of task ID {task_id} by user ID {user.id}.")
+                raise TaskVersionConflictException(task_id)
+            self._apply_counter_moves([(previous_key, (user.id, updated_task.status, updated_task.active))])
+            self._invalidate_cached_lists(user.id)
+            self._schedule_timers([updated_task])
             logger.info(f"Successfully updated task ID {task_id} for user ID {user.id}")
             return updated_task
         except TaskNotFoundException:
             raise
         except TaskUnauthorizedAccessException:
             raise
+        except (TaskVersionConflictException, TaskInvalidTransitionException):
+            raise
         except Exception as e:
             logger.error(f"Failed to update task ID {task_id} for user ID {user.id}: {str(e)}")
             raise
 
+    @transaction.atomic
+    def bulk_update_status(self, task_ids: List[int], status: str, user: User) -> Dict[str, List[int]]:
+        """
+        Set the status of many tasks of the authenticated user in a single statement.
+
+        :return: A dict sorting the requested IDs into the `changed` tasks, the `unchanged` ones
+            already in `status`, the `rejected` ones whose status can't move to `status`, the
+            `missing` ones and the `unauthorized` ones owned by other users.
+        """
+        logger.info(f"Setting status {status} on {len(task_ids)} tasks for user ID {user.id}.")
+        self._forget(task_ids)
+        result = {"changed": [], "unchanged": [], "rejected": [], "missing": [], "unauthorized": []}
+        moves = []
+        for task_id, owner_id, previous_status, active, updated in self.task_repository.bulk_update_status(
+                user, task_ids, status
+        ):
+            if owner_id is None:
+                result["missing"].append(task_id)
+            elif owner_id != user.id:
+                result["unauthorized"].append(task_id)
+            elif updated:
+                result["changed"].append(task_id)
+                moves.append(((user.id, previous_status, active), (user.id, status, active)))
+            elif previous_status == status:
+                result["unchanged"].append(task_id)
+            else:
+                result["rejected"].append(task_id)
+
+        if moves:
+            self._apply_counter_moves(moves)
+            self._invalidate_cached_lists(user.id)
+            if status in TaskStatus.terminal_values():
+                self._unschedule_timers(result["changed"])
+            else:
+                # Reopened tasks expire again, which needs their expiry dates.
+                self._schedule_timers(list(self.task_repository.iterate_task_timers(result["changed"])))
+        if result["unauthorized"]:
+            logger.error(f"Unauthorized access to task IDs {result['unauthorized']} by user ID {user.id}.")
+        logger.info(f"Successfully changed the status of {len(moves)} tasks for user ID {user.id}")
+        return result
+
+    @transaction.atomic
+    def transition_task(self, task_id: int, status: str, user: User) -> Task:
+        """
+        Move a task of the authenticated user to `status` with a single compare-and-set
+        statement that only applies when its current status allows it.
+        """
+        logger.info(f"Moving task ID {task_id} to {status} for user ID {user.id}.")
+        self._forget([task_id])
+        previous_status, task = self.task_repository.transition_task(task_id, user.id, status)
+        if previous_status is None:
+            self._raise_task_not_accessible(task_id, user)
+        if task is None:
+            logger.error(f"Invalid transition of task ID {task_id} from {previous_status} to {status}.")
+            raise TaskInvalidTransitionException(task_id, previous_status, status)
+
+        self._apply_counter_moves([((user.id, previous_status, task.active), (user.id, task.status, task.active))])
+        self._invalidate_cached_lists(user.id)
+        self._schedule_timers([task])
+        self._identity_map[task_id] = task
+        return task
+
     @transaction.atomic
     def delete_task(self, task_id: int, user: User, hard_delete: bool = False):
         """
         Delete a task. Perform a hard delete if `hard_delete` is True.
         """
-        task = self.get_task_details(task_id, user)
         if hard_delete:
             logger.info(f"Hard deleting task with ID {task_id} for user ID: {user.id}.")
-            task.delete(hard_delete=True)
+            self._forget([task_id])
+            # The counter follows the row as the DELETE found it, not an earlier unlocked read.
+            rows = self.task_repository.hard_delete_tasks(user, [task_id])
+            if not rows:
+                self._raise_task_not_accessible(task_id, user)
+            _, _, previous_status, previous_active = rows[0]
+            self.task_counter_repository.apply_deltas({(user.id, previous_status, previous_active): -1})
         else:
+            task = self.get_task_details(task_id, user)
+            previous_key = (user.id, task.status, task.active)
             logger.info(f"Soft deleting task with ID {task_id} for user ID: {user.id}.")
             task.delete()
+            self._apply_counter_moves([(previous_key, (user.id, task.status, False))])
+        self._invalidate_cached_lists(user.id)
+        self._unschedule_timers([task_id])
+
+    @transaction.atomic
+    def bulk_delete_tasks(self, task_ids: List[int], user: User, hard_delete: bool = False) -> Dict[str, List[int]]:
+        """
+        Delete many tasks of the authenticated user with a single statement, soft deleting
+        them unless `hard_delete` is True.
+
+        :return: A dict sorting the requested IDs into the `deleted` tasks, the `missing` ones
+            and the `unauthorized` ones owned by other users. Already inactive tasks count as
+            deleted by a soft delete.
+        """
+        self._forget(task_ids)
+        if hard_delete:
+            logger.info(f"Hard deleting {len(task_ids)} tasks for user ID: {user.id}.")
+            rows = self.task_repository.hard_delete_tasks(user, task_ids)
+            deltas = Counter()
+            for _, _, status, active in rows:
+                deltas[(user.id, status, active)] -= 1
+            self.task_counter_repository.apply_deltas(deltas)
+        else:
+            logger.info(f"Soft deleting {len(task_ids)} tasks for user ID: {user.id}.")
+            rows = self.task_repository.soft_delete_tasks(user, task_ids)
+            self._apply_counter_moves([((user.id, status, True), (user.id, status, False)) for _, _, status in rows])
+
+        deleted = {row[0] for row in rows}
+        remaining = [task_id for task_id in task_ids if task_id not in deleted]
+        owners = self.task_repository.get_task_owners(remaining) if remaining else {}
+
+        result = {"deleted": [], "missing": [], "unauthorized": []}
+        for task_id in task_ids:
+            owner_id = user.id if task_id in deleted else owners.get(task_id)
+            if owner_id is None:
+                result["missing"].append(task_id)
+            elif owner_id != user.id:
+                result["unauthorized"].append(task_id)
+            else:
+                result["deleted"].append(task_id)
+
+        if rows:
+            self._invalidate_cached_lists(user.id)
+            self._unschedule_timers(list(deleted))
+        if result["unauthorized"]:
+            logger.error(f"Unauthorized access to task IDs {result['unauthorized']} by user ID {user.id}.")
+        return result
+
+    @transaction.atomic
+    def expire_tasks_batch(self, batch_size: int, task_ids: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+        """
+        Mark one batch of tasks whose expiry date has passed as expired, on behalf of the
+        expiry sweep or of the timer dispatcher, moving their counters in the same transaction.
+
+        :param task_ids: Only consider these tasks, all of them when omitted.
+        :return: The `(id, owner_id)` of each expired task.
+        """
+        rows = self.task_repository.expire_tasks_batch(batch_size, task_ids)
+        expired = TaskStatus.EXPIRED.value
+        self._apply_counter_moves([
+            ((owner_id, previous_status, active), (owner_id, expired, active))
+            for _, owner_id, previous_status, active in rows
+        ])
+        for owner_id in {owner_id for _, owner_id, _, _ in rows}:
+            self._invalidate_cached_lists(owner_id)
+        self._unschedule_timers([task_id for task_id, _, _, _ in rows])
+        return [(task_id, owner_id) for task_id, owner_id, _, _ in rows]
+
+    def get_task_stats(self, user: User) -> Dict:
+        """
+        Summarize a user's tasks per status and activity from the task counters,
+        without reading the tasks themselves.
+
+        :return: A dict with the `total`, `active` and `inactive` counts, the count of tasks
+            per status in `by_status` and the count of active tasks per status in `active_by_status`.
+        """
+        logger.info(f"Fetching task statistics for user ID: {user.id}.")
+        by_status = {status.value: 0 for status in TaskStatus}
+        active_by_status = {status.value: 0 for status in TaskStatus}
+        for counter in self.task_counter_repository.get_counters_by_user(user):
+            by_status[counter.status] += counter.count
+            if counter.active:
+                active_by_status[counter.status] += counter.count
+
+        total = sum(by_status.values())
+        active = sum(active_by_status.values())
+        return {
+            "total": total,
+            "active": active,
+            "inactive": total - active,
+            "by_status": by_status,
+            "active_by_status": active_by_status,
+        }
+
+    def _raise_task_not_accessible(self, task_id: int, user: User):
+        """
+        Raise why a statement scoped to the tasks of the authenticated user didn't find a
+        task: it doesn't exist, or it belongs to another user.
+        """
+        owner_id = self.task_repository.get_task_owners([task_id]).get(task_id)
+        if owner_id is None:
+            logger.error(f"Task with ID {task_id} not found.")
+            raise TaskNotFoundException(task_id)
+        logger.error(f"Unauthorized access to task ID {task_id} by user ID {user.id}.")
+        raise TaskUnauthorizedAccessException()
+
+    @staticmethod
+    def _is_deferred(task: Task, fields: Optional[List[str]]) -> bool:
+        """
+        Whether any of the fields, or of all the task fields when omitted, wasn't loaded.
+        """
+        deferred = task.get_deferred_fields()
+        return bool(deferred) if fields is None else not deferred.isdisjoint(fields)
+
+    def _forget(self, task_ids: List[int]) -> None:
+        """
+        Drop tasks about to be written with set-based statements from the identity map.
+        """
+        for task_id in task_ids:
+            self._identity_map.pop(task_id, None)
+
+    def _apply_counter_moves(self, moves: List[Tuple[Tuple, Tuple]]) -> None:
+        """
+        Move tasks between counters, each move being a `(previous_key, new_key)` pair
+        of `(owner_id, status, active)` counter keys.
+        """
+        deltas = Counter()
+        for previous_key, new_key in moves:
+            if previous_key != new_key:
+                deltas[previous_key] -= 1
+                deltas[new_key] += 1
+        self.task_counter_repository.apply_deltas(deltas)
+
+    def _schedule_timers(self, tasks: Iterable[Union[Task, TaskTimer]]) -> None:
+        """
+        Schedule the expiry and reminder of tasks in the timer index once the current
+        transaction commits. Tasks are given as instances or as timers read from the database.
+        """
+        terminal = TaskStatus.terminal_values()
+        timers = [
+            task if isinstance(task, tuple) else (
+                task.id,
+                task.expires_at if task.active and task.status not in terminal else None,
+                task.reminder_sent_for,
+            )
+            for task in tasks
+        ]
+        if timers:
+            transaction.on_commit(lambda: self.task_timer_index.schedule(timers), robust=True)
+
+    def _unschedule_timers(self, task_ids: List[int]) -> None:
+        """
+        Drop tasks that no longer expire from the timer index once the current transaction commits.
+        """
+        if task_ids:
+            transaction.on_commit(lambda: self.task_timer_index.unschedule(task_ids), robust=True)
+
+    def _invalidate_cached_lists(self, user_id: int) -> None:
+        """
+        Invalidate the user's cached task lists once the current transaction commits,
+        so a concurrent reader can't repopulate the cache with pre-commit data.
+        """
+        transaction.on_commit(lambda: self.task_list_cache.invalidate(user_id), robust=True)
@@ -1,25 +1,42 @@
 import logging
-from celery import shared_task
+import time
+from itertools import groupby, islice
+from operator import attrgetter, itemgetter
+from typing import Iterable, List, Optional, Tuple
+
+from celery import group, shared_task
 from django.conf import settings
-from django.core.mail import send_mail
-from django.utils.timezone import localtime
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.utils.timezone import localtime, now
 
-from tasks.enum import TaskStatus
+from tasks.models import Task
+from tasks.delivery import ReminderClaims, ReminderDeliveryError, SendRateLimiter
 from tasks.repository import TaskRepository
+from tasks.service import TaskService
+from tasks.timers import TaskTimerIndex
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
-def send_expiry_reminder():
+def send_expiry_reminder(digest: bool = False):
     """
     Task to send reminders for tasks expiring soon.
+
+    :param digest: Send each owner a single email listing all of their expiring tasks, fanned
+        out over the workers by `fan_out_expiry_reminders`, instead of an email per task.
     """
     try:
         logger.info("Starting task: send_expiry_reminder")
-        tasks_to_remind = TaskRepository.get_tasks_expiring_soon(hours=3)
+        if digest:
+            queued = fan_out_expiry_reminders()
+            logger.info(f"Queued expiry reminder digests for {queued} tasks.")
+            return
+
+        tasks_to_remind = TaskRepository.get_tasks_expiring_soon(hours=settings.TASKS_REMINDER_LEAD_HOURS)
         logger.info(f"Found {len(tasks_to_remind)} tasks expiring soon.")
 
+        reminded = []
         for task in tasks_to_remind:
             try:
                 local_expires_at = localtime(task.expires_at).strftime('%B %d, %Y, at %I:%M %p')
@@ -32,30 +49,240 @@ def send_expiry_reminder():
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[task.owner.email],
                 )
+                reminded.append((task.id, task.expires_at))
                 logger.info(f"Reminder sent for task ID {task.id} to {task.owner.email}")
             except Exception as e:
                 logger.error(f"Failed to send email for task ID {task.id}: {e}")
 
+        TaskRepository.mark_reminders_sent(reminded)
+
     except Exception as e:
         logger.error(f"An error occurred in send_expiry_reminder: {e}")
 
 
+def build_expiry_digest(email: str, tasks: List[Task]) -> EmailMessage:
+    """
+    Build the reminder email of one owner for all of their expiring tasks.
+    """
+    expiries = [(task.title, localtime(task.expires_at).strftime('%B %d, %Y, at %I:%M %p')) for task in tasks]
+    if len(expiries) == 1:
+        title, local_expires_at = expiries[0]
+        body = f'Your task "{title}" is set to expire on {local_expires_at}. ⏰'
+    else:
+        body = "Your tasks are set to expire soon. ⏰\n\n" + "\n".join(
+            f'- "{title}" on {local_expires_at}' for title, local_expires_at in expiries
+        )
+    return EmailMessage(
+        subject="Task Expiry Reminder",
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
+
+def send_expiry_digests(tasks: Iterable[Task]) -> Tuple[int, int]:
+    """
+    Send one reminder email per owner of the given tasks, which must be ordered by owner,
+    over a single SMTP connection and within the global `TASKS_REMINDER_SEND_RATE`. Owners
+    are handled in batches of `TASKS_REMINDER_SEND_BATCH_SIZE`: their reminders are claimed
+    first, so none is sent twice, and the sent ones are marked as reminded afterwards.
+
+    :return: The numbers of emails sent and of emails that failed.
+    """
+    claims, limiter = ReminderClaims(), SendRateLimiter()
+    sent = failed = 0
+    owners = (list(owner_tasks) for _, owner_tasks in groupby(tasks, key=attrgetter("owner_id")))
+    with get_connection() as connection:
+        while batch := list(islice(owners, settings.TASKS_REMINDER_SEND_BATCH_SIZE)):
+            batch_sent, batch_failed = _send_batch(connection, batch, claims, limiter)
+            sent += batch_sent
+            failed += batch_failed
+    return sent, failed
+
+
+def _send_batch(
+        connection,
+        batch: List[List[Task]],
+        claims: ReminderClaims,
+        limiter: SendRateLimiter
+) -> Tuple[int, int]:
+    """
+    Send the digests of a batch of owners, given as the lists of their tasks.
+    """
+    reminders = [(task.id, task.expires_at) for owner_tasks in batch for task in owner_tasks]
+    claimed = {reminder for reminder, is_claimed in zip(reminders, claims.claim(reminders)) if is_claimed}
+
+    reminded, sent, failed = [], 0, 0
+    for owner_tasks in batch:
+        owner_tasks = [task for task in owner_tasks if (task.id, task.expires_at) in claimed]
+        if not owner_tasks:
+            continue
+        owner_reminders = [(task.id, task.expires_at) for task in owner_tasks]
+        limiter.acquire()
+        try:
+            connection.send_messages([build_expiry_digest(owner_tasks[0].owner.email, owner_tasks)])
+        except Exception as e:
+            logger.error(f"Failed to send the expiry reminder digest of user ID {owner_tasks[0].owner_id}: {e}")
+            claims.release(owner_reminders)
+            failed += 1
+            continue
+        reminded += owner_reminders
+        sent += 1
+
+    TaskRepository.mark_reminders_sent(reminded)
+    return sent, failed
+
+
+@shared_task(
+    autoretry_for=(ReminderDeliveryError,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=5,
+)
+def send_expiry_reminder_chunk(task_ids: List[int]):
+    """
+    Task to send the reminder digests of one chunk of owners. The tasks still due for a
+    reminder are read again, so a retry only sends the reminders that failed, with an
+    exponential backoff.
+
+    :return: The number of emails sent.
+    """
+    tasks_to_remind = TaskRepository.iterate_tasks_expiring_soon(
+        hours=settings.TASKS_REMINDER_LEAD_HOURS,
+        chunk_size=settings.TASKS_REMINDER_CHUNK_SIZE,
+        task_ids=task_ids,
+    )
+    sent, failed = send_expiry_digests(tasks_to_remind)
+    if failed:
+        raise ReminderDeliveryError(f"{failed} expiry reminder digests couldn't be sent.")
+    return sent
+
+
+def fan_out_expiry_reminders(task_ids: Optional[List[int]] = None) -> int:
+    """
+    Split the reminders of the tasks expiring soon into chunks of
+    `TASKS_REMINDER_OWNERS_PER_CHUNK` owners, delivered in parallel by a group of
+    `send_expiry_reminder_chunk` subtasks.
+
+    :param task_ids: Only remind these tasks, all of the due ones when omitted.
+    :return: The number of tasks to remind.
+    """
+    rows = TaskRepository.iterate_task_ids_expiring_soon(
+        hours=settings.TASKS_REMINDER_LEAD_HOURS, chunk_size=settings.TASKS_REMINDER_CHUNK_SIZE, task_ids=task_ids
+    )
+    owners = groupby(rows, key=itemgetter(0))
+    chunks = []
+    while chunk := [
+        task_id
+        for _, owner_rows in islice(owners, settings.TASKS_REMINDER_OWNERS_PER_CHUNK)
+        for _, task_id in owner_rows
+    ]:
+        chunks.append(chunk)
+
+    if chunks:
+        group(send_expiry_reminder_chunk.s(chunk) for chunk in chunks).apply_async()
+        logger.info(f"Fanned out expiry reminders of {sum(map(len, chunks))} tasks in {len(chunks)} chunks.")
+    return sum(map(len, chunks))
+
+
 @shared_task
 def mark_expired_tasks():
     """
-    Task to mark tasks as expired.
+    Task to mark tasks as expired, in batches of `TASKS_EXPIRY_BATCH_SIZE` tasks that each
+    run as a single UPDATE in their own transaction. Logging every expired task is enabled
+    through `TASKS_EXPIRY_LOG_EACH_TASK`.
+
+    :return: The number of tasks marked as expired.
     """
+    total = 0
     try:
         logger.info("Starting task: mark_expired_tasks")
-        expired_tasks = TaskRepository.get_expired_tasks()
-        logger.info(f"Found {len(expired_tasks)} tasks to mark as expired.")
+        task_service = TaskService()
+        batch_size = settings.TASKS_EXPIRY_BATCH_SIZE
 
-        for task in expired_tasks:
-            try:
-                TaskRepository.update_task_status(task, TaskStatus.EXPIRED.value)
-                logger.info(f"Task ID {task.id} marked as expired.")
-            except Exception as e:
-                logger.error(f"Failed to mark task ID {task.id} as expired: {e}")
+        batches = 0
+        while True:
+            started = time.perf_counter()
+            expired_tasks = task_service.expire_tasks_batch(batch_size)
+            elapsed = time.perf_counter() - started
+            batches += 1
+            total += len(expired_tasks)
+            logger.info(f"Batch {batches}: marked {len(expired_tasks)} tasks as expired in {elapsed * 1000:.1f} ms.")
+
+            if settings.TASKS_EXPIRY_LOG_EACH_TASK:
+                for task_id, owner_id in expired_tasks:
+                    logger.info(f"Task ID {task_id} of user ID {owner_id} marked as expired.")
+
+            if len(expired_tasks) < batch_size:
+                break
 
+        logger.info(f"Marked {total} tasks as expired in {batches} batches.")
     except Exception as e:
         logger.error(f"An error occurred in mark_expired_tasks: {e}")
+    return total
+
+
+@shared_task
+def dispatch_task_timers():
+    """
+    Task to expire and remind exactly the tasks that are due, taking them out of the timer
+    index in batches of `TASKS_TIMER_DISPATCH_BATCH_SIZE`. Due tasks are checked again
+    against the database, and put back in the index when their batch fails or when they
+    were skipped while locked and are still pending.
+
+    :return: The numbers of tasks marked as expired and of tasks queued for a reminder.
+    """
+    expired = reminded = 0
+    try:
+        index = TaskTimerIndex()
+        task_service = TaskService(task_timer_index=index)
+        batch_size = settings.TASKS_TIMER_DISPATCH_BATCH_SIZE
+        current_time = now()
+
+        while task_ids := index.pop_due(index.EXPIRY_KEY, current_time, batch_size):
+            try:
+                expired_tasks = task_service.expire_tasks_batch(len(task_ids), task_ids=task_ids)
+            except Exception:
+                index.requeue(index.EXPIRY_KEY, task_ids, current_time)
+                raise
+            expired += len(expired_tasks)
+            skipped = set(task_ids).difference(task_id for task_id, _ in expired_tasks)
+            if skipped:
+                # Tasks locked by another transaction were skipped, put back those still pending.
+                index.schedule(TaskRepository.iterate_task_timers(task_ids=list(skipped)))
+            if len(task_ids) < batch_size:
+                break
+
+        while task_ids := index.pop_due(index.REMINDER_KEY, current_time, batch_size):
+            try:
+                reminded += fan_out_expiry_reminders(task_ids)
+            except Exception:
+                index.requeue(index.REMINDER_KEY, task_ids, current_time)
+                raise
+            if len(task_ids) < batch_size:
+                break
+
+        if expired or reminded:
+            logger.info(f"Dispatched task timers: {expired} tasks expired, {reminded} tasks to remind.")
+    except Exception as e:
+        logger.error(f"An error occurred in dispatch_task_timers: {e}")
+    return expired, reminded
+
+
+@shared_task
+def reconcile_task_timers():
+    """
+    Task to rebuild the timer index from the database, restoring entries lost to a failed
+    commit hook, a Redis restart or an eviction. Overdue tasks are expired by the next dispatch.
+
+    :return: The number of scheduled tasks.
+    """
+    try:
+        logger.info("Starting task: reconcile_task_timers")
+        return TaskTimerIndex().rebuild(
+            TaskRepository.iterate_task_timers(chunk_size=settings.TASKS_REMINDER_CHUNK_SIZE)
+        )
+    except Exception as e:
+        logger.error(f"An error occurred in reconcile_task_timers: {e}")
+        return 0
@@ -0,0 +1,228 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# A task timer: `(task_id, expires_at, reminder_sent_for)`, where `expires_at` is None
+# when the task no longer expires.
+TaskTimer = Tuple[int, Optional[datetime], Optional[datetime]]
+
+
+class TaskTimerIndex:
+    """
+    Redis sorted sets of the pending task expiries and reminders, scored by the Unix time
+    at which they are due, so the dispatcher only ever reads the due tasks instead of
+    scanning the tasks table.
+
+    The index only says when to look at a task: Postgres stays the source of truth and
+    due tasks are checked again when they are expired or reminded. Entries lost along
+    the way are restored by `rebuild`.
+
+    While a rebuild runs, every write to the index also journals the IDs of the tasks it
+    touched, so the rebuilt sets keep the live entries of those tasks rather than the ones
+    read from the database before the write.
+    """
+    EXPIRY_KEY = "tasks:timers:expiry"
+    REMINDER_KEY = "tasks:timers:reminder"
+    REBUILD_KEY = "tasks:timers:rebuild"
+    JOURNAL_KEY = "tasks:timers:journal"
+
+    # Atomically take up to ARGV[2] members scored up to ARGV[1] out of KEYS[1], so
+    # concurrent dispatchers never get the same task, journaling them in KEYS[3] while
+    # a rebuild holds KEYS[2].
+    POP_DUE_SCRIPT = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+    local rebuilding = redis.call('EXISTS', KEYS[2]) == 1
+    for start = 1, #due, 1000 do
+        local chunk = {unpack(due, start, math.min(start + 999, #due))}
+        redis.call('ZREM', KEYS[1], unpack(chunk))
+        if rebuilding then
+            redis.call('SADD', KEYS[3], unpack(chunk))
+        end
+    end
+    return due
+    """
+
+    # Journal the ARGV task IDs in KEYS[2] while a rebuild holds KEYS[1].
+    JOURNAL_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        for start = 1, #ARGV, 1000 do
+            redis.call('SADD', KEYS[2], unpack(ARGV, start, math.min(start + 999, #ARGV)))
+        end
+    end
+    """
+
+    # Take the KEYS[1] rebuild lock as ARGV[1] for ARGV[2] seconds and start an empty
+    # KEYS[2] journal, unless another rebuild holds the lock.
+    START_REBUILD_SCRIPT = """
+    if not redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', tonumber(ARGV[2])) then
+        return 0
+    end
+    redis.call('DEL', KEYS[2])
+    return 1
+    """
+
+    # Swap the rebuilt KEYS[3] and KEYS[4] sets in for the live KEYS[1] and KEYS[2] ones,
+    # carrying over the live entries of the tasks journaled in KEYS[5], and release the
+    # KEYS[6] rebuild lock. Gives up with -1 when ARGV[1] no longer holds the lock, since
+    # writes stopped being journaled when it expired.
+    SWAP_SCRIPT = """
+    if redis.call('GET', KEYS[6]) ~= ARGV[1] then
+        redis.call('DEL', KEYS[3], KEYS[4])
+        return -1
+    end
+    local journal = redis.call('SMEMBERS', KEYS[5])
+    for _, task_id in ipairs(journal) do
+        for live = 1, 2 do
+            local score = redis.call('ZSCORE', KEYS[live], task_id)
+            if score then
+                redis.call('ZADD', KEYS[live + 2], score, task_id)
+            else
+                redis.call('ZREM', KEYS[live + 2], task_id)
+            end
+        end
+    end
+    for live = 1, 2 do
+        if redis.call('EXISTS', KEYS[live + 2]) == 1 then
+            redis.call('RENAME', KEYS[live + 2], KEYS[live])
+        else
+            redis.call('DEL', KEYS[live])
+        end
+    end
+    redis.call('DEL', KEYS[5], KEYS[6])
+    return #journal
+    """
+
+    def __init__(self, reminder_lead: Optional[timedelta] = None, alias: str = "default"):
+        self.reminder_lead = reminder_lead or timedelta(hours=settings.TASKS_REMINDER_LEAD_HOURS)
+        self.alias = alias
+        self._scripts = {}
+
+    @property
+    def redis(self):
+        return get_redis_connection(self.alias)
+
+    def _script(self, source: str):
+        if source not in self._scripts:
+            self._scripts[source] = self.redis.register_script(source)
+        return self._scripts[source]
+
+    def _journal(self, pipeline, task_ids: List[int]) -> None:
+        """
+        Journal the tasks written to by `pipeline` for a running rebuild. The pipeline must be
+        transactional, so the writes and the journal land together.
+        """
+        if task_ids:
+            self._script(self.JOURNAL_SCRIPT)(keys=[self.REBUILD_KEY, self.JOURNAL_KEY], args=task_ids, client=pipeline)
+
+    def schedule(self, timers: Iterable[TaskTimer]) -> None:
+        """
+        Add, move or drop the expiry and reminder entries of tasks. A task is reminded
+        `reminder_lead` before it expires, unless it was already reminded of that expiry.
+        """
+        pipeline = self.redis.pipeline(transaction=True)
+        task_ids = []
+        for task_id, expires_at, reminder_sent_for in timers:
+            task_ids.append(task_id)
+            if expires_at is None:
+                pipeline.zrem(self.EXPIRY_KEY, task_id)
+                pipeline.zrem(self.REMINDER_KEY, task_id)
+                continue
+            pipeline.zadd(self.EXPIRY_KEY, {task_id: expires_at.timestamp()})
+            if reminder_sent_for is None:
+                pipeline.zadd(self.REMINDER_KEY, {task_id: (expires_at - self.reminder_lead).timestamp()})
+            else:
+                pipeline.zrem(self.REMINDER_KEY, task_id)
+        if not task_ids:
+            return
+        self._journal(pipeline, task_ids)
+        pipeline.execute()
+
+    def unschedule(self, task_ids: List[int]) -> None:
+        """
+        Drop the entries of tasks that no longer expire.
+        """
+        if not task_ids:
+            return
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.zrem(self.EXPIRY_KEY, *task_ids)
+        pipeline.zrem(self.REMINDER_KEY, *task_ids)
+        self._journal(pipeline, task_ids)
+        pipeline.execute()
+
+    def pop_due(self, key: str, until: datetime, limit: int) -> List[int]:
+        """
+        Take the IDs of up to `limit` tasks due by `until` out of the `key` sorted set,
+        soonest first, in a single round trip.
+        """
+        due = self._script(self.POP_DUE_SCRIPT)(
+            keys=[key, self.REBUILD_KEY, self.JOURNAL_KEY], args=[until.timestamp(), limit]
+        )
+        return [int(task_id) for task_id in due]
+
+    def requeue(self, key: str, task_ids: List[int], due_at: datetime) -> None:
+        """
+        Put back popped tasks whose processing failed, due at `due_at`.
+        """
+        if not task_ids:
+            return
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.zadd(key, {task_id: due_at.timestamp() for task_id in task_ids})
+        self._journal(pipeline, task_ids)
+        pipeline.execute()
+
+    def rebuild(self, timers: Iterable[TaskTimer], chunk_size: int = 2000) -> int:
+        """
+        Rebuild the index from the given timers, read from the database after this is called.
+        The sets are built under temporary keys and swapped in atomically, so the dispatcher
+        never sees a partial index, along with the live entries of the tasks written to in
+        the meantime. Only one rebuild runs at a time, others give up.
+
+        :return: The number of tasks scheduled from `timers`.
+        """
+        token = uuid.uuid4().hex
+        started = self._script(self.START_REBUILD_SCRIPT)(
+            keys=[self.REBUILD_KEY, self.JOURNAL_KEY], args=[token, settings.TASKS_TIMER_REBUILD_TIMEOUT]
+        )
+        if not started:
+            logger.warning("Skipped rebuilding the task timer index, another rebuild is running.")
+            return 0
+
+        suffix = f":rebuild:{token}"
+        temporary = {self.EXPIRY_KEY: self.EXPIRY_KEY + suffix, self.REMINDER_KEY: self.REMINDER_KEY + suffix}
+        sizes = dict.fromkeys(temporary, 0)
+
+        timers = iter(timers)
+        while chunk := list(islice(timers, chunk_size)):
+            expiries, reminders = {}, {}
+            for task_id, expires_at, reminder_sent_for in chunk:
+                if expires_at is None:
+                    continue
+                expiries[task_id] = expires_at.timestamp()
+                if reminder_sent_for is None:
+                    reminders[task_id] = (expires_at - self.reminder_lead).timestamp()
+            pipeline = self.redis.pipeline(transaction=False)
+            for key, members in ((self.EXPIRY_KEY, expiries), (self.REMINDER_KEY, reminders)):
+                if members:
+                    pipeline.zadd(temporary[key], members)
+                    sizes[key] += len(members)
+            pipeline.execute()
+
+        merged = self._script(self.SWAP_SCRIPT)(
+            keys=[self.EXPIRY_KEY, self.REMINDER_KEY, *temporary.values(), self.JOURNAL_KEY, self.REBUILD_KEY],
+            args=[token],
+        )
+        if merged < 0:
+            logger.error("Gave up rebuilding the task timer index, the rebuild outlived its lock.")
+            return 0
+        logger.info(
+            f"Rebuilt the task timer index with {sizes[self.EXPIRY_KEY]} expiries "
+            f"and {sizes[self.REMINDER_KEY]} reminders, keeping the live entries of {merged} tasks."
+        )
+        return sizes[self.EXPIRY_KEY]
@@ -1,10 +1,23 @@
 from django.urls import path
 
-from tasks.views import TaskListView, TaskDetailView
+from tasks.views import (
+    TaskListView,
+    TaskDetailView,
+    TaskStatsView,
+    TaskBulkCreateView,
+    TaskBulkStatusView,
+    TaskBulkDeleteView,
+    TaskTransitionView,
+)
 
 app_name = 'tasks'
 
 urlpatterns = [
     path('', TaskListView.as_view(), name='task_list'),
+    path('bulk/', TaskBulkCreateView.as_view(), name='task_bulk_create'),
+    path('bulk-status/', TaskBulkStatusView.as_view(), name='task_bulk_status'),
+    path('bulk-delete/', TaskBulkDeleteView.as_view(), name='task_bulk_delete'),
+    path('stats/', TaskStatsView.as_view(), name='task_stats'),
     path('<int:task_id>/', TaskDetailView.as_view(), name='task_detail'),
+    path('<int:task_id>/transition/', TaskTransitionView.as_view(), name='task_transition'),
 ]
@@ -1,5 +1,7 @@
-from typing import Optional
+from typing import Any, Optional, Tuple
 
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from drf_yasg import openapi
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -7,14 +9,27 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 
+from tasks.cache import TaskListCache
 from tasks.serializers import (
     TaskResponseSerializer,
     TaskCreateSerializer,
     TaskUpdateSerializer,
     TaskDetailSerializer,
+    TaskDetailQuerySerializer,
     TaskFilterSerializer,
+    TaskSearchResultSerializer,
+    TaskStatsSerializer,
+    TaskBulkCreateResultSerializer,
+    TaskBulkStatusSerializer,
+    TaskBulkStatusResultSerializer,
+    TaskBulkDeleteSerializer,
+    TaskBulkDeleteResultSerializer,
+    TaskTransitionSerializer,
 )
 from tasks.service import TaskService
+from utils.conditional import ConditionalValidators
+from utils.pagination import encode_cursor
+from utils.streaming import stream_json_array
 
 
 class TaskListView(APIView):
@@ -26,14 +41,25 @@ class TaskListView(APIView):
     def __init__(
         self,
         task_service: Optional[TaskService] = None,
+        task_list_cache: Optional[TaskListCache] = None,
         **kwargs
     ):
         super().__init__(**kwargs)
         self.task_service = task_service or TaskService()
+        self.task_list_cache = task_list_cache or TaskListCache()
 
     @swagger_auto_schema(
         operation_summary="List tasks",
-        operation_description="Retrieve tasks for the authenticated user based on optional filters.",
+        operation_description=(
+            "Retrieve tasks for the authenticated user based on optional filters. "
+            "Sending `limit` and/or `cursor` switches to keyset pagination: the response becomes a page "
+            "whose `next_cursor` must be sent back as `cursor` to fetch the following page. "
+            "Sending `stream=true` instead streams the full list as a JSON array. "
+            "`fields` restricts each task to a comma-separated subset of its fields. "
+            "`q` runs a full-text search over titles and descriptions, returning at most `limit` "
+            "tasks ranked by relevance with highlighted excerpts. "
+            "Lists that aren't streamed carry an `ETag` and support conditional requests through `If-None-Match`."
+        ),
         query_serializer=TaskFilterSerializer,
         responses={
             200: TaskResponseSerializer(many=True)
@@ -46,12 +72,91 @@ class TaskListView(APIView):
         filter_serializer = TaskFilterSerializer(data=request.query_params)
         filter_serializer.is_valid(raise_exception=True)
 
+        if filter_serializer.validated_data.get("stream"):
+            # Streamed lists are read while they are sent, there is no body to derive validators from.
+            return self._stream_tasks(request.user, filter_serializer)
+
+        # The ETag is computed from the body and cached along with it, so a response never
+        # pairs a body with the validator of another read.
+        (data, etag), cache_hit = self.task_list_cache.get_or_set(
+            request.user.id,
+            filter_serializer.validated_data,
+            lambda: self._build_list(request.user, filter_serializer),
+        )
+        validators = ConditionalValidators(etag=etag)
+        not_modified = validators.evaluate(request)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(data, status=status.HTTP_200_OK)
+        response["X-Cache"] = "HIT" if cache_hit else "MISS"
+        return validators.apply(response)
+
+    def _build_list(self, user, filter_serializer: TaskFilterSerializer) -> Tuple[Any, str]:
+        """
+        Build the list matching the validated filters along with its ETag.
+        """
+        data = self._list_tasks(user, filter_serializer)
+        return data, ConditionalValidators(data).etag
+
+    def _list_tasks(self, user, filter_serializer: TaskFilterSerializer):
+        """
+        Fetch and serialize the tasks matching the validated filters.
+        """
         is_active = filter_serializer.validated_data.get("is_active")
         task_status = filter_serializer.validated_data.get("status")
+        fields = filter_serializer.validated_data.get("fields", TaskResponseSerializer.Meta.fields)
 
-        tasks = self.task_service.get_tasks(user=request.user, is_active_filter=is_active, status_filter=task_status)
-        serializer = TaskResponseSerializer(tasks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if "q" in filter_serializer.validated_data:
+            tasks = self.task_service.search_tasks(
+                user=user,
+                query=filter_serializer.validated_data["q"],
+                is_active_filter=is_active,
+                status_filter=task_status,
+                limit=filter_serializer.validated_data.get("limit"),
+                fields=fields,
+            )
+            return TaskSearchResultSerializer.compile(fields).serialize_rows(tasks)
+
+        if filter_serializer.is_paginated:
+            page = self.task_service.get_tasks_page(
+                user=user,
+                is_active_filter=is_active,
+                status_filter=task_status,
+                limit=filter_serializer.validated_data.get("limit"),
+                cursor=filter_serializer.validated_data.get("cursor"),
+                include_total=filter_serializer.validated_data.get("include_total"),
+                fields=fields,
+            )
+            return {
+                "results": TaskResponseSerializer.compile(fields).serialize_rows(page["results"]),
+                "next_cursor": encode_cursor(page["next_cursor"]) if page["next_cursor"] else None,
+                "estimated_total": page["estimated_total"],
+            }
+
+        tasks = self.task_service.get_tasks(
+            user=user, is_active_filter=is_active, status_filter=task_status, fields=fields
+        )
+        return TaskResponseSerializer.compile(fields).serialize_rows(tasks)
+
+    def _stream_tasks(self, user, filter_serializer: TaskFilterSerializer) -> StreamingHttpResponse:
+        """
+        Stream the tasks matching the validated filters as a JSON array, serializing
+        them one at a time as the server-side cursor yields them.
+        """
+        fields = filter_serializer.validated_data.get("fields", TaskResponseSerializer.Meta.fields)
+        tasks = self.task_service.iterate_tasks(
+            user=user,
+            is_active_filter=filter_serializer.validated_data.get("is_active"),
+            status_filter=filter_serializer.validated_data.get("status"),
+            fields=fields,
+        )
+        serializer = TaskResponseSerializer.compile(fields)
+        return StreamingHttpResponse(
+            stream_json_array(tasks, serializer.serialize_row),
+            content_type="application/json",
+            status=status.HTTP_200_OK,
+        )
 
     @swagger_auto_schema(
         operation_summary="Create a task",
@@ -71,6 +176,163 @@ class TaskListView(APIView):
         return Response(TaskResponseSerializer(task).data, status=status.HTTP_201_CREATED)
 
 
+class TaskBulkCreateView(APIView):
+    """
+    API view to handle the creation of many tasks at once.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def __init__(
+        self,
+        task_service: Optional[TaskService] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.task_service = task_service or TaskService()
+
+    @swagger_auto_schema(
+        operation_summary="Create tasks in bulk",
+        operation_description=(
+            "Create up to `TASKS_BULK_MAX_ITEMS` tasks for the authenticated user in one request. "
+            "Valid tasks are created even when others are invalid: each created task is reported "
+            "with its index in the request and its ID, and each invalid one with its index and errors. "
+            "Responds with 400 when no task could be created."
+        ),
+        request_body=TaskCreateSerializer(many=True),
+        responses={
+            201: TaskBulkCreateResultSerializer,
+            400: TaskBulkCreateResultSerializer,
+        },
+    )
+    def post(self, request):
+        """
+        Create many tasks for the authenticated user.
+        """
+        serializer = TaskCreateSerializer(data=request.data, many=True, max_length=settings.TASKS_BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+
+        indexes = [index for index, _ in serializer.validated_data]
+        tasks = []
+        if indexes:
+            tasks = self.task_service.bulk_create_tasks(
+                [data for _, data in serializer.validated_data], user=request.user
+            )
+
+        result = TaskBulkCreateResultSerializer({
+            "created": [{"index": index, "id": task.id} for index, task in zip(indexes, tasks)],
+            "errors": serializer.item_errors,
+        })
+        return Response(result.data, status=status.HTTP_201_CREATED if tasks else status.HTTP_400_BAD_REQUEST)
+
+
+class TaskBulkStatusView(APIView):
+    """
+    API view to handle status changes of many tasks at once.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def __init__(
+        self,
+        task_service: Optional[TaskService] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.task_service = task_service or TaskService()
+
+    @swagger_auto_schema(
+        operation_summary="Change the status of tasks in bulk",
+        operation_description=(
+            "Set the status of up to `TASKS_BULK_MAX_ITEMS` tasks of the authenticated user in one request. "
+            "The response sorts the requested IDs into changed tasks, unchanged tasks already in that status, "
+            "rejected tasks whose status can't move to that status, missing tasks and tasks of other users, "
+            "which are left untouched."
+        ),
+        request_body=TaskBulkStatusSerializer,
+        responses={
+            200: TaskBulkStatusResultSerializer
+        },
+    )
+    def post(self, request):
+        """
+        Set the status of many tasks of the authenticated user.
+        """
+        serializer = TaskBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = self.task_service.bulk_update_status(
+            serializer.validated_data["ids"], serializer.validated_data["status"], user=request.user
+        )
+        return Response(TaskBulkStatusResultSerializer(result).data, status=status.HTTP_200_OK)
+
+
+class TaskBulkDeleteView(APIView):
+    """
+    API view to handle the deletion of many tasks at once.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def __init__(
+        self,
+        task_service: Optional[TaskService] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.task_service = task_service or TaskService()
+
+    @swagger_auto_schema(
+        operation_summary="Delete tasks in bulk",
+        operation_description=(
+            "Delete up to `TASKS_BULK_MAX_ITEMS` tasks of the authenticated user in one request, "
+            "soft deleting them unless `hard_delete` is true. The response sorts the requested IDs into "
+            "deleted tasks, missing tasks and tasks of other users, which are left untouched."
+        ),
+        request_body=TaskBulkDeleteSerializer,
+        responses={
+            200: TaskBulkDeleteResultSerializer
+        },
+    )
+    def post(self, request):
+        """
+        Delete many tasks of the authenticated user (soft delete by default).
+        """
+        serializer = TaskBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = self.task_service.bulk_delete_tasks(
+            serializer.validated_data["ids"],
+            user=request.user,
+            hard_delete=serializer.validated_data["hard_delete"],
+        )
+        return Response(TaskBulkDeleteResultSerializer(result).data, status=status.HTTP_200_OK)
+
+
+class TaskStatsView(APIView):
+    """
+    API view to handle task statistics.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def __init__(
+        self,
+        task_service: Optional[TaskService] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.task_service = task_service or TaskService()
+
+    @swagger_auto_schema(
+        operation_summary="Get task statistics",
+        operation_description="Retrieve the number of tasks of the authenticated user per status and activity.",
+        responses={
+            200: TaskStatsSerializer
+        },
+    )
+    def get(self, request):
+        """
+        Get task statistics for the authenticated user.
+        """
+        stats = self.task_service.get_task_stats(user=request.user)
+        return Response(TaskStatsSerializer(stats).data, status=status.HTTP_200_OK)
+
+
 class TaskDetailView(APIView):
     """
     API view to handle task details, updates, and deletions.
@@ -87,7 +349,12 @@ class TaskDetailView(APIView):
 
     @swagger_auto_schema(
         operation_summary="Get task details",
-        operation_description="Retrieve details of a specific task for the authenticated user.",
+        operation_description=(
+            "Retrieve details of a specific task for the authenticated user. "
+            "`fields` restricts the task to a comma-separated subset of its fields. "
+            "Supports conditional requests through `If-None-Match`."
+        ),
+        query_serializer=TaskDetailQuerySerializer,
         responses={
             200: TaskDetailSerializer
         },
@@ -96,9 +363,19 @@ class TaskDetailView(APIView):
         """
         Get task details for the authenticated user.
         """
-        task = self.task_service.get_task_details(task_id, user=request.user)
-        serializer = TaskDetailSerializer(task)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        query_serializer = TaskDetailQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        fields = query_serializer.validated_data.get("fields", TaskDetailSerializer.Meta.fields)
+
+        task = self.task_service.get_task_details(task_id, user=request.user, fields=fields)
+        validators = ConditionalValidators(task_id, fields, task.updated_at)
+        not_modified = validators.evaluate(request)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = TaskDetailSerializer.compile(fields)
+        response = Response(serializer.serialize_instance(task), status=status.HTTP_200_OK)
+        return validators.apply(response)
 
     @swagger_auto_schema(
         operation_summary="Update a task",
@@ -139,3 +416,38 @@ class TaskDetailView(APIView):
         hard_delete = request.query_params.get("hard_delete", "false").lower() == "true"
         self.task_service.delete_task(task_id, user=request.user, hard_delete=hard_delete)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TaskTransitionView(APIView):
+    """
+    API view to handle task status transitions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def __init__(
+        self,
+        task_service: Optional[TaskService] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.task_service = task_service or TaskService()
+
+    @swagger_auto_schema(
+        operation_summary="Change the status of a task",
+        operation_description=(
+            "Move a task of the authenticated user to a new status, provided its current status allows it. "
+            "Responds with 409 when the transition isn't allowed."
+        ),
+        request_body=TaskTransitionSerializer,
+        responses={
+            200: TaskDetailSerializer
+        },
+    )
+    def post(self, request, task_id):
+        """
+        Move a task of the authenticated user to a new status.
+        """
+        serializer = TaskTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task = self.task_service.transition_task(task_id, serializer.validated_data["status"], user=request.user)
+        return Response(TaskDetailSerializer.compile().serialize_instance(task), status=status.HTTP_200_OK)
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -42,9 +43,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'authentication',
     'tasks',
     'users',
+    'utils',
     'rest_framework',
     'drf_yasg',
 ]
@@ -115,6 +118,42 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# Each login and signup pays one PBKDF2-SHA256 hash, whose cost is linear in its iterations:
+# - 'low_latency', 600,000 iterations: OWASP's minimum for PBKDF2-SHA256, about 30% cheaper
+#   than Django's default, for login-heavy loads.
+# - 'default', 870,000 iterations: Django's default.
+# - 'hardened', 1,500,000 iterations: about 1.7 times the default cost, for stronger
+#   resistance to offline cracking of leaked hashes.
+# On one core of a small VM these take about 370, 530 and 920 ms; run `benchmark_login` to
+# measure them on the target hardware. Changing the profile rehashes passwords on login.
+# Hashes run in a pool of `PASSWORD_HASHING_THREADS` threads, one per core, with at most
+# `PASSWORD_HASHING_QUEUE_SIZE` waiting; other callers get a 503 after
+# `PASSWORD_HASHING_QUEUE_TIMEOUT` seconds.
+
+PASSWORD_HASHING_PROFILES = {
+    'low_latency': 600_000,
+    'default': 870_000,
+    'hardened': 1_500_000,
+}
+PASSWORD_HASHING_PROFILE = config('PASSWORD_HASHING_PROFILE', default='default')
+PASSWORD_HASHER_ITERATIONS = PASSWORD_HASHING_PROFILES[PASSWORD_HASHING_PROFILE]
+PASSWORD_HASHERS = [
+    'users.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHING_THREADS = config('PASSWORD_HASHING_THREADS', default=os.cpu_count() or 1, cast=int)
+PASSWORD_HASHING_QUEUE_SIZE = config('PASSWORD_HASHING_QUEUE_SIZE', default=32, cast=int)
+PASSWORD_HASHING_QUEUE_TIMEOUT = config('PASSWORD_HASHING_QUEUE_TIMEOUT', default=5, cast=float)
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.PooledModelBackend',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -141,7 +180,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -173,6 +212,13 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Authentication
+
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_STATELESS_USER = config('AUTH_STATELESS_USER', default=False, cast=bool)
+# Serve `token/` with a view awaiting the password hashing pool, when running `todolist.asgi`.
+AUTH_ASYNC_TOKEN_VIEW = config('AUTH_ASYNC_TOKEN_VIEW', default=False, cast=bool)
+
 
 # Logging
 
@@ -228,16 +274,76 @@ CELERY_WORKER_SEND_TASK_EVENTS = True
 # Celery Beat
 
 CELERY_BEAT_SCHEDULE = {
-    'send-expiry-reminder-every-hour': {
-        'task': 'tasks.tasks.send_expiry_reminder',
-        'schedule': schedules.crontab(minute=0),
+    'dispatch-task-timers-every-10-seconds': {
+        'task': 'tasks.tasks.dispatch_task_timers',
+        'schedule': 10.0,
     },
-    'mark-expired-tasks-every-15-minutes': {
-        'task': 'tasks.tasks.mark_expired_tasks',
-        'schedule': schedules.crontab(minute='*/15'),
+    'reconcile-task-timers-every-hour': {
+        'task': 'tasks.tasks.reconcile_task_timers',
+        'schedule': schedules.crontab(minute=0),
     },
 }
 
+# Tasks
+
+TASKS_PAGE_DEFAULT_LIMIT = 50
+TASKS_PAGE_MAX_LIMIT = 100
+TASKS_LIST_CACHE_TIMEOUT = 300
+TASKS_STREAM_CHUNK_SIZE = 2000
+TASKS_BULK_MAX_ITEMS = 1000
+TASKS_BULK_CREATE_BATCH_SIZE = 500
+TASKS_EXPIRY_BATCH_SIZE = 1000
+TASKS_EXPIRY_LOG_EACH_TASK = config('TASKS_EXPIRY_LOG_EACH_TASK', default=False, cast=bool)
+TASKS_REMINDER_CHUNK_SIZE = 2000
+TASKS_REMINDER_SEND_BATCH_SIZE = 100
+TASKS_REMINDER_OWNERS_PER_CHUNK = 500
+TASKS_REMINDER_SEND_RATE = config('TASKS_REMINDER_SEND_RATE', default=0, cast=int)
+TASKS_REMINDER_CLAIM_TIMEOUT = 24 * 60 * 60
+TASKS_REMINDER_LEAD_HOURS = 3
+TASKS_TIMER_DISPATCH_BATCH_SIZE = 1000
+TASKS_TIMER_REBUILD_TIMEOUT = 30 * 60
+
+# Rate limiting
+# Requests are limited by the first policy matching their URL name and method, or by the
+# default one. Algorithms: 'fixed_window', 'sliding_window_log', 'sliding_window_counter'
+# and 'token_bucket'. Requests are counted per client 'ip' or per authenticated 'user',
+# each costing `cost` of the `limit` units per `period` seconds.
+# A policy with a `lease` makes each worker take that many units at once from Redis and
+# spend them in process for up to `lease_ttl` seconds: Redis sees one request per lease,
+# and a client may be limited early by up to `lease` units per other worker holding one.
+# Leases are kept for the `RATE_LIMIT_LEASE_CACHE_SIZE` most recent clients of each worker.
+
+RATE_LIMIT_DEFAULT_POLICY = {
+    'name': 'default',
+    'algorithm': 'sliding_window_log',
+    'limit': 100,
+    'period': 60,
+    'key': 'ip',
+    'lease': config('RATE_LIMIT_DEFAULT_LEASE', default=0, cast=int),
+}
+RATE_LIMIT_LEASE_CACHE_SIZE = 10000
+RATE_LIMIT_POLICIES = [
+    {
+        'name': 'token',
+        'url_names': ['token_obtain_pair'],
+        'methods': ['POST'],
+        'algorithm': 'sliding_window_counter',
+        'limit': 20,
+        'period': 60,
+        'key': 'ip',
+    },
+    {
+        'name': 'task_bulk',
+        'url_names': ['tasks:task_bulk_create', 'tasks:task_bulk_status', 'tasks:task_bulk_delete'],
+        'methods': ['POST'],
+        'algorithm': 'token_bucket',
+        'limit': 100,
+        'period': 60,
+        'key': 'user',
+        'cost': 10,
+    },
+]
+
 # Cache
 
 CACHES = {
@@ -1,6 +1,24 @@
+import asyncio
+import json
+import threading
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import AccessToken
 
+from authentication.serializers import CustomTokenObtainPairSerializer
+from authentication.views import AsyncTokenObtainPairView
+from users.cache import UserCache
+from users.hashing import PasswordHashingPool
+from users.models import User
+from utils.exceptions import PasswordHashingUnavailableException
+
 
 @pytest.mark.django_db
 def test_token_obtain(api_client, test_user):
@@ -38,3 +56,175 @@ def test_token_refresh(api_client, test_user):
     access_token = AccessToken(refresh_response.data["access"])
     assert access_token["email"] == test_user.email
     assert access_token["name"] == test_user.name
+
+
+@pytest.mark.django_db
+def test_authenticated_user_is_cached(api_client, test_user, django_capture_on_commit_callbacks):
+    """
+    Test that the user of a token is only looked up until it's cached, and looked up again
+    once it changes.
+    """
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(test_user)}")
+
+    def user_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get("/tasks/stats/")
+        return response, [query for query in context.captured_queries if "users_user" in query["sql"]]
+
+    response, queries = user_queries()
+    assert response.status_code == 200 and len(queries) == 1
+    response, queries = user_queries()
+    assert response.status_code == 200 and queries == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_user.is_active = False
+        test_user.save()
+    response, queries = user_queries()
+    assert response.status_code == 401 and len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_cached_user_keeps_no_password_hash(api_client, test_user, monkeypatch):
+    """
+    Test that cached users hold a fingerprint of the password hash instead of the hash,
+    and that tokens issued for another password are still rejected from the cache.
+    """
+    monkeypatch.setattr(api_settings, "CHECK_REVOKE_TOKEN", True)
+    token = AccessToken.for_user(test_user)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    assert api_client.get("/tasks/stats/").status_code == 200
+
+    entry = cache.get(UserCache.KEY.format(user_id=test_user.id))
+    assert test_user.password not in entry
+    user, password_fingerprint = UserCache().get(test_user.id)
+    assert (user.id, user.email, user.is_active) == (test_user.id, test_user.email, True)
+    assert "password" in user.get_deferred_fields()
+
+    token[api_settings.REVOKE_TOKEN_CLAIM] = "another password"
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get("/tasks/stats/")
+    assert response.status_code == 401
+    assert not [query for query in context.captured_queries if "users_user" in query["sql"]]
+
+
+@pytest.mark.django_db
+def test_stateless_user_from_claims(api_client, test_user, settings):
+    """
+    Test that stateless users are built from the token claims without querying the database.
+    """
+    settings.AUTH_STATELESS_USER = True
+    token = CustomTokenObtainPairSerializer.get_token(test_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get("/tasks/stats/")
+
+    assert response.status_code == 200
+    assert not [query for query in context.captured_queries if "users_user" in query["sql"]]
+
+
+@pytest.mark.django_db
+def test_token_obtain_rehashes_password(api_client, settings):
+    """
+    Test that logging in rehashes passwords hashed with other iterations than the current
+    profile's, and that wrong passwords are rejected without rehashing.
+    """
+    settings.PASSWORD_HASHER_ITERATIONS = 1000
+    user = User.objects.create_user(name="Rehash", email="rehash@example.com", password="password123")
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+
+    settings.PASSWORD_HASHER_ITERATIONS = 2000
+    response = api_client.post("/token/", {"email": user.email, "password": "wrong-password"})
+    assert response.status_code == 401
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+
+    response = api_client.post("/token/", {"email": user.email, "password": "password123"})
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$2000$")
+    assert user.check_password("password123")
+
+
+def test_password_hashing_pool_turns_callers_away_when_full():
+    """
+    Test that callers are turned away once every thread and queue slot of the pool is taken.
+    """
+    pool = PasswordHashingPool(threads=1, queue_size=0, timeout=0.1)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait()
+
+    holder = threading.Thread(target=pool.run, args=(hold,))
+    holder.start()
+    started.wait()
+    try:
+        with pytest.raises(PasswordHashingUnavailableException):
+            pool.run(make_password, "password123")
+    finally:
+        release.set()
+        holder.join()
+    assert pool.run(check_password, "password123", make_password("password123"))
+
+
+@pytest.mark.django_db
+def test_async_token_obtain(settings):
+    """
+    Test that the async token view issues tokens, rehashes outdated hashes, and answers
+    wrong credentials and malformed payloads like the DRF view.
+    """
+    settings.PASSWORD_HASHER_ITERATIONS = 1000
+    user = User.objects.create_user(name="Async", email="async@example.com", password="password123")
+    settings.PASSWORD_HASHER_ITERATIONS = 2000
+    view = async_to_sync(AsyncTokenObtainPairView.as_view())
+    factory = AsyncRequestFactory()
+
+    def post(data):
+        return view(factory.post("/token/", data, content_type="application/json"))
+
+    response = post({"email": user.email, "password": "wrong-password"})
+    assert response.status_code == 401
+    assert json.loads(response.content)["error"] == "No active account found with the given credentials"
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+
+    assert post({"email": user.email}).status_code == 400
+    assert post("{").status_code == 400
+
+    response = post({"email": user.email, "password": "password123"})
+    assert response.status_code == 200
+    tokens = json.loads(response.content)
+    assert AccessToken(tokens["access_token"])["email"] == user.email
+    assert "refresh_token" in tokens
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$2000$")
+
+
+def test_password_hashing_pool_run_async_leaves_loop_free():
+    """
+    Test that awaiting a hash leaves the event loop running other coroutines, and that async
+    callers are turned away once every slot of the pool is taken.
+    """
+    pool = PasswordHashingPool(threads=1, queue_size=0, timeout=0.1)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait()
+        return "done"
+
+    async def scenario():
+        holder = asyncio.ensure_future(pool.run_async(hold))
+        await asyncio.to_thread(started.wait)
+        try:
+            with pytest.raises(PasswordHashingUnavailableException):
+                await pool.run_async(make_password, "password123")
+        finally:
+            release.set()
+        assert await holder == "done"
+        assert await pool.run_async(check_password, "password123", make_password("password123"))
+
+    asyncio.run(scenario())
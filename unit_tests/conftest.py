@@ -1,7 +1,10 @@
 import pytest
 
+from django.core.cache import cache
 from rest_framework.test import APIClient
 
+from todolist.celery import app as celery_app
+
 from tasks.enum import TaskStatus
 from tasks.models import Task
 from tasks.repository import TaskRepository
@@ -11,6 +14,22 @@ from users.repository import UserRepository
 from users.service import UserService
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Start every test with an empty cache, since the test database is rebuilt between runs.
+    """
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def celery_eager(monkeypatch):
+    """
+    Run the Celery tasks queued by the code under test in process, without a broker.
+    """
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
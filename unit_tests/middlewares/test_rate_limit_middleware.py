@@ -4,6 +4,9 @@ from django.test import RequestFactory
 from django.core.cache import cache
 from utils.middlewares import RateLimitMiddleware
 import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from rest_framework_simplejwt.tokens import AccessToken
 
 
 @pytest.fixture
@@ -16,6 +19,18 @@ def rate_limit_middleware():
     return RateLimitMiddleware(dummy_get_response)
 
 
+@pytest.fixture
+def build_middleware(settings):
+    """Fixture building the middleware with the given policies."""
+
+    def build(default_policy, policies=()):
+        settings.RATE_LIMIT_DEFAULT_POLICY = default_policy
+        settings.RATE_LIMIT_POLICIES = list(policies)
+        return RateLimitMiddleware(lambda request: HttpResponse("OK"))
+
+    return build
+
+
 @pytest.fixture
 def request_factory():
     """Fixture to provide a request factory."""
@@ -46,6 +61,104 @@ def test_rate_limit_exceeded(rate_limit_middleware, request_factory):
     assert "Rate limit exceeded" in response.content.decode()
 
 
+def test_rate_limit_holds_under_concurrent_requests(rate_limit_middleware, request_factory):
+    """Test that parallel bursts can't go past the limit."""
+    cache.clear()
+
+    def send(_):
+        request = request_factory.get("/")
+        request.META["REMOTE_ADDR"] = "127.0.0.1"
+        return rate_limit_middleware(request).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        status_codes = list(executor.map(send, range(300)))
+
+    assert status_codes.count(200) == 100
+    assert status_codes.count(429) == 200
+
+
+def test_rate_limit_headers(rate_limit_middleware, request_factory):
+    """Test that responses describe the client's quota in RateLimit headers."""
+    cache.clear()
+    request = request_factory.get("/")
+    request.META["REMOTE_ADDR"] = "127.0.0.1"
+
+    response = rate_limit_middleware(request)
+    assert response["RateLimit-Policy"] == "100;w=60"
+    assert response["RateLimit-Limit"] == "100"
+    assert response["RateLimit-Remaining"] == "99"
+    assert 0 < int(response["RateLimit-Reset"]) <= 60
+
+    for _ in range(100):
+        response = rate_limit_middleware(request)
+    assert response.status_code == 429
+    assert response["RateLimit-Remaining"] == "0"
+    assert 0 < int(response["Retry-After"]) <= 60
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["fixed_window", "sliding_window_log", "sliding_window_counter", "token_bucket"]
+)
+def test_rate_limit_algorithms(algorithm, build_middleware, request_factory):
+    """Test that every algorithm allows `limit` units per period, each request costing `cost` units."""
+    cache.clear()
+    middleware = build_middleware({"name": "default", "algorithm": algorithm, "limit": 30, "period": 60, "cost": 3})
+    request = request_factory.post("/")
+    request.META["REMOTE_ADDR"] = "127.0.0.1"
+
+    status_codes = [middleware(request).status_code for _ in range(11)]
+
+    assert status_codes == [200] * 10 + [429]
+
+
+@pytest.mark.django_db
+def test_rate_limit_policies(build_middleware, request_factory, test_user, another_user):
+    """Test that the first policy matching the URL name and method applies, keyed on the token user."""
+    cache.clear()
+    middleware = build_middleware(
+        {"name": "default", "algorithm": "fixed_window", "limit": 100, "period": 60},
+        [{
+            "name": "task_writes",
+            "url_names": ["tasks:task_list"],
+            "methods": ["POST"],
+            "algorithm": "token_bucket",
+            "limit": 2,
+            "period": 60,
+            "key": "user",
+        }],
+    )
+
+    def send(method, path, user):
+        request = getattr(request_factory, method)(path, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        request.META["REMOTE_ADDR"] = "127.0.0.1"
+        return middleware(request)
+
+    assert [send("post", "/tasks/", test_user).status_code for _ in range(3)] == [200, 200, 429]
+    assert send("post", "/tasks/", another_user).status_code == 200
+    response = send("get", "/tasks/", test_user)
+    assert response.status_code == 200
+    assert response["RateLimit-Limit"] == "100"
+
+
+def test_rate_limit_local_leases(build_middleware, request_factory):
+    """Test that leased units are spent in process, each worker going past its lease to Redis."""
+    cache.clear()
+    policy = {"name": "default", "algorithm": "fixed_window", "limit": 100, "period": 60, "lease": 10}
+    workers = [build_middleware(policy), build_middleware(policy)]
+    request = request_factory.get("/")
+    request.META["REMOTE_ADDR"] = "127.0.0.1"
+
+    algorithm = workers[0].default_policy.algorithm
+    with patch.object(algorithm, "hit", wraps=algorithm.hit) as hit:
+        responses = [workers[0](request) for _ in range(45)]
+    assert hit.call_count == 5
+    assert [response["RateLimit-Remaining"] for response in responses[:2]] == ["99", "98"]
+
+    status_codes = [workers[index % 2](request).status_code for index in range(100)]
+    assert 100 - 2 * 9 <= 45 + status_codes.count(200) <= 100
+    assert status_codes[-1] == 429
+
+
 def test_rate_limit_reset_after_window(rate_limit_middleware, request_factory):
     """Test that the rate limit resets after the time window."""
     cache.clear()
@@ -1,17 +1,33 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from unittest.mock import patch, MagicMock
-from tasks.tasks import send_expiry_reminder, mark_expired_tasks
+from django.utils.timezone import localtime, now
+
+from tasks.models import Task
+from tasks.repository import TaskCounterRepository
+from tasks.service import TaskService
+from tasks.tasks import (
+    send_expiry_reminder,
+    mark_expired_tasks,
+    dispatch_task_timers,
+    reconcile_task_timers,
+    fan_out_expiry_reminders,
+    send_expiry_reminder_chunk,
+)
 from tasks.enum import TaskStatus
+from tasks.timers import TaskTimerIndex
 
 
 @pytest.mark.django_db
 @patch("tasks.tasks.TaskRepository.get_tasks_expiring_soon")
+@patch("tasks.tasks.TaskRepository.mark_reminders_sent")
 @patch("tasks.tasks.send_mail")
 @patch("tasks.tasks.settings.DEFAULT_FROM_EMAIL", "test@example.com")
 @patch("tasks.tasks.localtime")
-def test_send_expiry_reminder(mock_localtime, mock_send_mail, mock_get_tasks_expiring_soon):
+def test_send_expiry_reminder(
+        mock_localtime, mock_send_mail, mock_mark_reminders_sent, mock_get_tasks_expiring_soon
+):
     mock_task = MagicMock()
     mock_task.title = "Mock Task"
     mock_task.expires_at = datetime(2024, 12, 1, 15, 0, tzinfo=timezone.utc)
@@ -30,6 +46,7 @@ def test_send_expiry_reminder(mock_localtime, mock_send_mail, mock_get_tasks_exp
         from_email="test@example.com",
         recipient_list=[mock_task.owner.email],
     )
+    mock_mark_reminders_sent.assert_called_once_with([(mock_task.id, mock_task.expires_at)])
 
 
 @pytest.mark.django_db
@@ -52,33 +69,49 @@ def test_send_expiry_reminder_logs_error(mock_logger, mock_get_tasks_expiring_so
 
 
 @pytest.mark.django_db
-@patch("tasks.tasks.TaskRepository.get_expired_tasks")
-@patch("tasks.tasks.TaskRepository.update_task_status")
-def test_mark_expired_tasks(mock_update_task_status, mock_get_expired_tasks):
-    mock_task = MagicMock()
-    mock_task.id = 1
+def test_mark_expired_tasks(test_user, another_user, settings):
+    """
+    Test that overdue tasks are expired in batches and their counters moved, leaving
+    other tasks untouched.
+    """
+    settings.TASKS_EXPIRY_BATCH_SIZE = 2
+    overdue = now() - timedelta(hours=1)
+    expired = [
+        Task.objects.create(owner=owner, title="Overdue", description="Expires", expires_at=overdue)
+        for owner in (test_user, test_user, another_user)
+    ]
+    done = Task.objects.create(
+        owner=test_user, title="Done", description="Kept", expires_at=overdue, status=TaskStatus.DONE.value
+    )
+    upcoming = Task.objects.create(
+        owner=test_user, title="Upcoming", description="Kept", expires_at=now() + timedelta(hours=1)
+    )
+    TaskCounterRepository.rebuild()
 
-    mock_get_expired_tasks.return_value = [mock_task]
+    with patch("tasks.tasks.logger") as mock_logger:
+        assert mark_expired_tasks() == 3
 
-    mark_expired_tasks()
+    assert Task.objects.filter(id__in=[task.id for task in expired], status=TaskStatus.EXPIRED.value).count() == 3
+    assert Task.objects.get(id=done.id).status == TaskStatus.DONE.value
+    assert Task.objects.get(id=upcoming.id).status == TaskStatus.CREATED.value
+    mock_logger.info.assert_called_with("Marked 3 tasks as expired in 2 batches.")
 
-    mock_get_expired_tasks.assert_called_once()
-    mock_update_task_status.assert_called_once_with(mock_task, TaskStatus.EXPIRED.value)
+    counters = {(counter.status, counter.count) for counter in TaskCounterRepository.get_counters_by_user(test_user)}
+    assert counters == {(TaskStatus.EXPIRED.value, 2), (TaskStatus.DONE.value, 1), (TaskStatus.CREATED.value, 1)}
 
 
 @pytest.mark.django_db
-@patch("tasks.tasks.TaskRepository.get_expired_tasks")
-@patch("tasks.tasks.logger")
-def test_mark_expired_tasks_logs_error(mock_logger, mock_get_expired_tasks):
-    mock_task = MagicMock()
-    mock_task.id = 1
-
-    mock_get_expired_tasks.return_value = [mock_task]
+def test_mark_expired_tasks_logs_each_task(sample_task, settings):
+    """
+    Test that every expired task is logged when `TASKS_EXPIRY_LOG_EACH_TASK` is enabled.
+    """
+    settings.TASKS_EXPIRY_LOG_EACH_TASK = True
+    Task.objects.filter(id=sample_task.id).update(expires_at=now() - timedelta(hours=1))
 
-    with patch("tasks.tasks.TaskRepository.update_task_status", side_effect=Exception("Update failure")):
+    with patch("tasks.tasks.logger") as mock_logger:
         mark_expired_tasks()
 
-    mock_logger.error.assert_called_with(f"Failed to mark task ID {mock_task.id} as expired: Update failure")
+    mock_logger.info.assert_any_call(f"Task ID {sample_task.id} of user ID {sample_task.owner_id} marked as expired.")
 
 
 @pytest.mark.django_db
@@ -97,9 +130,9 @@ def test_send_expiry_reminder_outer_exception(mock_logger, mock_get_tasks_expiri
 
 
 @pytest.mark.django_db
-@patch("tasks.tasks.TaskRepository.get_expired_tasks", side_effect=Exception("Outer exception in mark_expired_tasks"))
+@patch("tasks.tasks.TaskService.expire_tasks_batch", side_effect=Exception("Outer exception in mark_expired_tasks"))
 @patch("tasks.tasks.logger")
-def test_mark_expired_tasks_outer_exception(mock_logger, mock_get_expired_tasks):
+def test_mark_expired_tasks_outer_exception(mock_logger, mock_expire_tasks_batch):
     """
     Test handling of an outer exception in mark_expired_tasks.
     """
@@ -108,3 +141,199 @@ def test_mark_expired_tasks_outer_exception(mock_logger, mock_get_expired_tasks)
     mock_logger.error.assert_called_with(
         "An error occurred in mark_expired_tasks: Outer exception in mark_expired_tasks"
     )
+
+
+@pytest.mark.django_db
+def test_send_expiry_reminder_digest(test_user, another_user, mailoutbox, django_assert_num_queries):
+    """
+    Test that digest mode sends each owner one email listing their expiring tasks, reading
+    the tasks and owners in a single query once fanned out, and only reminds each task once.
+    """
+    soon = now() + timedelta(hours=1)
+    for owner, title in ((test_user, "First"), (another_user, "Foreign"), (test_user, "Second")):
+        Task.objects.create(owner=owner, title=title, description="Expiring", expires_at=soon)
+    Task.objects.create(owner=test_user, title="Later", description="Not yet", expires_at=soon + timedelta(days=1))
+
+    with django_assert_num_queries(3):
+        send_expiry_reminder(digest=True)
+
+    assert len(mailoutbox) == 2
+    digests = {message.to[0]: message.body for message in mailoutbox}
+    assert '"First"' in digests[test_user.email] and '"Second"' in digests[test_user.email]
+    assert "Later" not in digests[test_user.email]
+    assert digests[another_user.email].startswith('Your task "Foreign" is set to expire on')
+
+    send_expiry_reminder(digest=True)
+    assert len(mailoutbox) == 2
+
+
+@pytest.mark.django_db
+def test_expiry_reminder_rearmed_by_new_expiry(task_service, sample_task, test_user, mailoutbox):
+    """
+    Test that changing the expiry date of a reminded task makes it due for a new reminder.
+    """
+    Task.objects.filter(id=sample_task.id).update(expires_at=now() + timedelta(hours=1))
+    send_expiry_reminder(digest=True)
+    assert len(mailoutbox) == 1
+
+    task_service.update_task(sample_task.id, {"expires_at": now() + timedelta(hours=2)}, user=test_user)
+    send_expiry_reminder(digest=True)
+    assert len(mailoutbox) == 2
+
+
+@pytest.mark.django_db
+@patch("tasks.tasks.group")
+def test_fan_out_expiry_reminders(mock_group, test_user, another_user, settings):
+    """
+    Test that reminders are split into subtasks of `TASKS_REMINDER_OWNERS_PER_CHUNK` owners.
+    """
+    settings.TASKS_REMINDER_OWNERS_PER_CHUNK = 1
+    soon = now() + timedelta(hours=1)
+    first, second = (
+        Task.objects.create(owner=test_user, title=title, description="", expires_at=soon) for title in "AB"
+    )
+    foreign = Task.objects.create(owner=another_user, title="C", description="", expires_at=soon)
+
+    assert fan_out_expiry_reminders() == 3
+
+    assert list(mock_group.call_args.args[0]) == [
+        send_expiry_reminder_chunk.s([first.id, second.id]),
+        send_expiry_reminder_chunk.s([foreign.id]),
+    ]
+    mock_group.return_value.apply_async.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_expiry_reminder_chunk_retries_failed_digests(test_user, another_user, mailoutbox):
+    """
+    Test that a chunk whose digests fail is retried, only sending the failed digests again.
+    """
+    soon = now() + timedelta(hours=1)
+    tasks = [
+        Task.objects.create(owner=owner, title=owner.name, description="", expires_at=soon)
+        for owner in (test_user, another_user)
+    ]
+    attempts = []
+
+    def send_messages(backend, messages):
+        attempts.append(messages[0].to[0])
+        if attempts.count(another_user.email) == 1 and messages[0].to == [another_user.email]:
+            raise ConnectionError("Connection reset")
+        mailoutbox.extend(messages)
+        return len(messages)
+
+    with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", send_messages):
+        send_expiry_reminder_chunk.delay([task.id for task in tasks])
+
+    assert attempts == [test_user.email, another_user.email, another_user.email]
+    assert sorted(message.to[0] for message in mailoutbox) == sorted([test_user.email, another_user.email])
+    assert Task.objects.filter(reminder_sent_for__isnull=True).count() == 0
+
+
+@pytest.mark.django_db
+def test_dispatch_task_timers(task_service, test_user, mailoutbox, django_capture_on_commit_callbacks):
+    """
+    Test that the dispatcher only expires and reminds the tasks whose timers are due,
+    and drops their entries from the timer index.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        overdue = task_service.create_task(
+            {"title": "Overdue", "description": "", "expires_at": now() - timedelta(minutes=1)}, test_user
+        )
+        expiring = task_service.create_task(
+            {"title": "Expiring", "description": "", "expires_at": now() + timedelta(hours=1)}, test_user
+        )
+        later = task_service.create_task(
+            {"title": "Later", "description": "", "expires_at": now() + timedelta(days=2)}, test_user
+        )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert dispatch_task_timers() == (1, 1)
+
+    assert Task.objects.get(id=overdue.id).status == TaskStatus.EXPIRED.value
+    assert Task.objects.get(id=expiring.id).reminder_sent_for is not None
+    assert [message.body for message in mailoutbox] == [
+        f'Your task "Expiring" is set to expire on '
+        f'{localtime(expiring.expires_at).strftime("%B %d, %Y, at %I:%M %p")}. ⏰'
+    ]
+    index = TaskTimerIndex()
+    assert index.redis.zrange(index.EXPIRY_KEY, 0, -1) == [str(expiring.id).encode(), str(later.id).encode()]
+    assert index.redis.zrange(index.REMINDER_KEY, 0, -1) == [str(later.id).encode()]
+    assert dispatch_task_timers() == (0, 0)
+
+
+@pytest.mark.django_db
+def test_dispatch_task_timers_requeues_locked_tasks(task_service, test_user, django_capture_on_commit_callbacks):
+    """
+    Test that overdue tasks skipped by the expiry batch because they were locked are put
+    back in the timer index instead of waiting for the next reconciliation.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        overdue = task_service.create_task(
+            {"title": "Overdue", "description": "", "expires_at": now() - timedelta(minutes=1)}, test_user
+        )
+
+    with patch.object(TaskService, "expire_tasks_batch", return_value=[]):
+        assert dispatch_task_timers() == (0, 0)
+
+    index = TaskTimerIndex()
+    assert index.redis.zscore(index.EXPIRY_KEY, overdue.id) == overdue.expires_at.timestamp()
+    with django_capture_on_commit_callbacks(execute=True):
+        assert dispatch_task_timers() == (1, 0)
+    assert Task.objects.get(id=overdue.id).status == TaskStatus.EXPIRED.value
+
+
+@pytest.mark.django_db
+def test_reconcile_task_timers(test_user):
+    """
+    Test that reconciliation rebuilds the timer index from the database, dropping stale entries.
+    """
+    pending = Task.objects.create(
+        owner=test_user, title="Pending", description="", expires_at=now() + timedelta(days=1)
+    )
+    reminded = Task.objects.create(
+        owner=test_user, title="Reminded", description="", expires_at=now() + timedelta(hours=1)
+    )
+    Task.objects.filter(id=reminded.id).update(reminder_sent_for=reminded.expires_at)
+    Task.objects.create(
+        owner=test_user, title="Done", description="", status=TaskStatus.DONE.value,
+        expires_at=now() + timedelta(days=1),
+    )
+    index = TaskTimerIndex()
+    index.redis.zadd(index.EXPIRY_KEY, {"999999": 0})
+
+    assert reconcile_task_timers() == 2
+
+    expiries = dict(index.redis.zrange(index.EXPIRY_KEY, 0, -1, withscores=True))
+    assert expiries == {
+        str(reminded.id).encode(): reminded.expires_at.timestamp(),
+        str(pending.id).encode(): pending.expires_at.timestamp(),
+    }
+    reminders = dict(index.redis.zrange(index.REMINDER_KEY, 0, -1, withscores=True))
+    assert reminders == {str(pending.id).encode(): (pending.expires_at - index.reminder_lead).timestamp()}
+
+
+def test_task_timer_index_rebuild_keeps_concurrent_writes():
+    """
+    Test that entries written while the index is rebuilt survive the swap instead of being
+    replaced by the ones read before, and that a second rebuild gives up while one runs.
+    """
+    index = TaskTimerIndex()
+    expires_at = now() + timedelta(days=1)
+    moved_at = expires_at + timedelta(days=1)
+
+    def timers():
+        yield 1, expires_at, None
+        yield 2, expires_at, None
+        index.schedule([(1, moved_at, None), (3, expires_at, expires_at)])
+        index.unschedule([2])
+        assert index.rebuild([(4, expires_at, None)]) == 0
+
+    assert index.rebuild(timers()) == 2
+
+    expiries = dict(index.redis.zrange(index.EXPIRY_KEY, 0, -1, withscores=True))
+    assert expiries == {b"1": moved_at.timestamp(), b"3": expires_at.timestamp()}
+    reminders = dict(index.redis.zrange(index.REMINDER_KEY, 0, -1, withscores=True))
+    assert reminders == {b"1": (moved_at - index.reminder_lead).timestamp()}
+    assert not index.redis.exists(index.REBUILD_KEY, index.JOURNAL_KEY)
+
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from tasks.enum import TaskStatus
+from tasks.models import Task
+from users.models import User
+
+SEEDED_OWNERS = 10
+SEEDED_TASKS_PER_USER = 1000
+
+
+@pytest.fixture
+def seeded_tasks(test_user, another_user):
+    """
+    Seed the task table with a spread of owners, statuses, activity flags and creation and
+    expiry dates, and refresh the planner statistics. The planner settings are left alone,
+    so each plan is the one the planner picks for that distribution.
+    """
+    owners = [test_user, another_user] + User.objects.bulk_create(
+        [User(name=f"Owner {index}", email=f"owner{index}@example.com") for index in range(SEEDED_OWNERS - 2)]
+    )
+    statuses = [status.value for status in TaskStatus]
+    current_time = now()
+    Task.objects.bulk_create(
+        [
+            Task(
+                owner=owner,
+                title=f"Seeded task {index} topic{index % 100}",
+                description="Seeded for query plan checks",
+                status=statuses[index % len(statuses)],
+                active=index % 10 != 0,
+                expires_at=current_time + timedelta(hours=index % 48 - 24),
+            )
+            for index in range(SEEDED_TASKS_PER_USER)
+            for owner in owners
+        ]
+    )
+    table = Task._meta.db_table
+    with connection.cursor() as cursor:
+        # Tasks of each owner are created over time, interleaved with the other owners' tasks.
+        cursor.execute(f"UPDATE {table} SET created_at = now() - (SELECT max(id) FROM {table}) * interval '1 minute' "
+                       f"+ id * interval '1 minute'")
+        cursor.execute(f"ANALYZE {table}")
+    return Task.objects.filter(owner=test_user).order_by("id")
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}")
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+def assert_uses_index(queryset, *index_names, sorted_by_index=False):
+    """
+    Check that the plan of a QuerySet reads through one of `index_names`, and with
+    `sorted_by_index`, that rows come out of the index in order instead of going through a Sort.
+    """
+    plan = queryset.explain()
+    assert any(index_name in plan for index_name in index_names), plan
+    if sorted_by_index:
+        assert "Sort" not in plan, plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "is_active_filter, status_filter, index_names",
+    [
+        # Both owner indexes lead with `(owner, active)`, either one serves the activity filter.
+        (False, None, ("tasks_owner_active_created_idx", "tasks_owner_status_created_idx")),
+        (True, TaskStatus.IN_PROGRESS.value, ("tasks_owner_status_created_idx",)),
+        (False, TaskStatus.DONE.value, ("tasks_owner_status_created_idx",)),
+    ],
+)
+def test_get_tasks_by_user_uses_index(
+        task_repository, test_user, seeded_tasks, is_active_filter, status_filter, index_names
+):
+    assert_uses_index(task_repository.get_tasks_by_user(test_user, is_active_filter, status_filter), *index_names)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "is_active_filter, status_filter, index_name",
+    [
+        (True, None, "tasks_owner_active_created_idx"),
+        (False, None, "tasks_owner_active_created_idx"),
+        (True, TaskStatus.CREATED.value, "tasks_owner_status_created_idx"),
+    ],
+)
+def test_get_tasks_page_uses_index(
+        task_repository, test_user, seeded_tasks, is_active_filter, status_filter, index_name
+):
+    first_page = task_repository.get_tasks_page(test_user, is_active_filter, status_filter, limit=51)
+    assert_uses_index(first_page, index_name, sorted_by_index=True)
+
+    listed_tasks = seeded_tasks.filter(active=is_active_filter)
+    deep_task = listed_tasks[listed_tasks.count() // 2]
+    after = (deep_task.created_at, deep_task.id)
+    next_page = task_repository.get_tasks_page(test_user, is_active_filter, status_filter, limit=11, after=after)
+    assert_uses_index(next_page, index_name, sorted_by_index=True)
+    # The cursor bounds the index scan instead of filtering the rows read before it.
+    index_cond = next(line for line in next_page.explain().splitlines() if "Index Cond" in line)
+    assert "created_at <=" in index_cond, index_cond
+
+
+@pytest.mark.django_db
+def test_get_task_for_owner_uses_index(task_repository, test_user, seeded_tasks):
+    with CaptureQueriesContext(connection) as queries:
+        task_repository.get_task_for_owner(seeded_tasks.first().id, test_user.id)
+    plan = explain(queries.captured_queries[0]["sql"])
+    assert "tasks_task_pkey" in plan, plan
+
+
+@pytest.mark.django_db
+def test_get_tasks_expiring_soon_uses_index(task_repository, seeded_tasks):
+    assert_uses_index(task_repository.get_tasks_expiring_soon(hours=3), "tasks_pending_reminder_idx")
+
+
+@pytest.mark.django_db
+def test_get_expired_tasks_uses_index(task_repository, seeded_tasks):
+    tasks = task_repository.get_expired_tasks().order_by("expires_at")[:100]
+    assert_uses_index(tasks, "tasks_pending_expiry_idx", sorted_by_index=True)
+
+
+@pytest.mark.django_db
+def test_expire_tasks_batch_uses_index(task_repository, seeded_tasks):
+    # The batch is rolled back, so the plan is the one of the data the statement ran against.
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        task_repository.expire_tasks_batch(100)
+        transaction.set_rollback(True)
+    plan = explain(queries.captured_queries[-1]["sql"])
+    assert "tasks_pending_expiry_idx" in plan, plan
+    assert "Sort" not in plan, plan
+
+
+@pytest.mark.django_db
+def test_search_tasks_uses_index(task_repository, test_user, seeded_tasks):
+    assert_uses_index(task_repository.search_tasks(test_user, "topic7"), "tasks_search_vector_idx")
@@ -1,14 +1,24 @@
-from datetime import timedelta
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
 from unittest.mock import patch
 
 import pytest
-from django.utils.timezone import now
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.utils.http import http_date
+from django.utils.timezone import now, override as timezone_override
 from rest_framework import status
 
+from tasks.cache import TaskListCache
 from tasks.enum import TaskStatus
 from tasks.models import Task
-from tasks.serializers import TaskCreateSerializer
-from utils.exceptions import TaskNotFoundException, TaskUnauthorizedAccessException
+from tasks.serializers import TaskCreateSerializer, TaskResponseSerializer, TaskDetailSerializer
+from tasks.service import TaskService
+from utils.exceptions import TaskNotFoundException, TaskUnauthorizedAccessException, TaskVersionConflictException
+from utils.pagination import encode_cursor
 
 
 @pytest.mark.django_db
@@ -85,6 +95,31 @@ def test_delete_task_hard(authenticated_client, sample_task):
     assert not Task.objects.filter(id=sample_task.id).exists()
 
 
+@pytest.mark.django_db
+def test_delete_task_hard_counts_the_deleted_row(task_service, task_repository, test_user, another_user, sample_task):
+    """
+    Test that a hard delete takes the counted status from the deleted row, even when the task
+    changed after this service read it, and tells missing tasks from other users' ones.
+    """
+    task_service.get_task_details(sample_task.id, test_user)
+    TaskService(task_repository=task_repository).transition_task(
+        sample_task.id, TaskStatus.IN_PROGRESS.value, test_user
+    )
+
+    task_service.delete_task(sample_task.id, test_user, hard_delete=True)
+
+    stats = task_service.get_task_stats(test_user)
+    assert stats["total"] == 0
+    assert all(count == 0 for count in stats["by_status"].values())
+
+    other_task = Task.objects.create(owner=another_user, title="Other Task", description="Not yours")
+    with pytest.raises(TaskUnauthorizedAccessException):
+        task_service.delete_task(other_task.id, test_user, hard_delete=True)
+    with pytest.raises(TaskNotFoundException):
+        task_service.delete_task(sample_task.id, test_user, hard_delete=True)
+    assert Task.objects.filter(id=other_task.id).exists()
+
+
 @pytest.mark.django_db
 def test_get_tasks_expiring_soon(task_repository, sample_task):
     """
@@ -245,3 +280,652 @@ def test_update_task_general_exception(task_service, sample_task, test_user):
             f"Failed to update task ID {sample_task.id} for user ID {test_user.id}: Unexpected error"
         )
         mock_update_task.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_get_tasks_paginated(authenticated_client, test_user):
+    """
+    Test walking through the task list with keyset pagination.
+    """
+    tasks = [
+        Task.objects.create(owner=test_user, title=f"Task {index}", description="Paginated task")
+        for index in range(5)
+    ]
+
+    response = authenticated_client.get("/tasks/", {"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert [task["id"] for task in response.data["results"]] == [tasks[4].id, tasks[3].id]
+    assert response.data["next_cursor"] is not None
+    assert response.data["estimated_total"] is None
+
+    seen = [task["id"] for task in response.data["results"]]
+    while response.data["next_cursor"]:
+        response = authenticated_client.get("/tasks/", {"limit": 2, "cursor": response.data["next_cursor"]})
+        assert response.status_code == status.HTTP_200_OK
+        seen += [task["id"] for task in response.data["results"]]
+
+    assert seen == [task.id for task in reversed(tasks)]
+
+
+@pytest.mark.django_db
+def test_get_tasks_paginated_with_estimated_total(authenticated_client, sample_task):
+    """
+    Test that the estimated total is returned when requested.
+    """
+    response = authenticated_client.get("/tasks/", {"limit": 10, "include_total": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["next_cursor"] is None
+    assert isinstance(response.data["estimated_total"], int)
+
+
+@pytest.mark.django_db
+def test_get_tasks_invalid_cursor(authenticated_client):
+    """
+    Test that a malformed cursor is rejected.
+    """
+    response = authenticated_client.get("/tasks/", {"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "cursor" in response.data["detail"]
+
+
+@pytest.mark.django_db
+def test_get_tasks_served_from_cache(authenticated_client, sample_task):
+    """
+    Test that a repeated list request is served from the cache and counted as a hit.
+    """
+    first_response = authenticated_client.get("/tasks/")
+    second_response = authenticated_client.get("/tasks/")
+
+    assert first_response["X-Cache"] == "MISS"
+    assert second_response["X-Cache"] == "HIT"
+    assert second_response.data == first_response.data
+    assert TaskListCache().get_stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+@pytest.mark.django_db
+def test_task_writes_invalidate_cached_list(authenticated_client, sample_task, django_capture_on_commit_callbacks):
+    """
+    Test that creating, updating and deleting a task bump the owner's cache version.
+    """
+    authenticated_client.get("/tasks/")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post("/tasks/", {"title": "Fresh Task", "description": "Not cached yet"})
+    response = authenticated_client.get("/tasks/")
+    assert response["X-Cache"] == "MISS"
+    assert {task["title"] for task in response.data} == {"Sample Task", "Fresh Task"}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.put(f"/tasks/{sample_task.id}/", {"title": "Renamed Task"})
+    response = authenticated_client.get("/tasks/")
+    assert response["X-Cache"] == "MISS"
+    assert {task["title"] for task in response.data} == {"Renamed Task", "Fresh Task"}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.delete(f"/tasks/{sample_task.id}/")
+    response = authenticated_client.get("/tasks/")
+    assert response["X-Cache"] == "MISS"
+    assert [task["title"] for task in response.data] == ["Fresh Task"]
+
+
+@pytest.mark.django_db
+def test_get_tasks_streamed(authenticated_client, test_user):
+    """
+    Test that the streamed list holds the same tasks as the paginated list, newest first.
+    """
+    for index in range(3):
+        Task.objects.create(owner=test_user, title=f"Streamed Task {index}", description="Streamed task")
+
+    response = authenticated_client.get("/tasks/", {"stream": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming
+    assert response["Content-Type"] == "application/json"
+
+    streamed = json.loads(b"".join(response.streaming_content))
+    page = authenticated_client.get("/tasks/", {"limit": 10}).data["results"]
+    assert streamed == json.loads(json.dumps(page))
+
+
+@pytest.mark.django_db
+def test_get_tasks_streamed_rejects_pagination(authenticated_client):
+    """
+    Test that streaming can't be combined with pagination parameters.
+    """
+    response = authenticated_client.get("/tasks/", {"stream": True, "limit": 10})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_get_tasks_with_sparse_fieldset(authenticated_client, sample_task, django_assert_num_queries):
+    """
+    Test that `fields` restricts both the list response and the loaded columns.
+    """
+    with django_assert_num_queries(1) as captured:
+        response = authenticated_client.get("/tasks/", {"fields": "title"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == [{"id": sample_task.id, "title": sample_task.title}]
+    assert '"description"' not in captured.captured_queries[-1]["sql"]
+    assert '"expires_at"' not in captured.captured_queries[-1]["sql"]
+
+
+@pytest.mark.django_db
+def test_get_task_details_with_sparse_fieldset(authenticated_client, sample_task):
+    """
+    Test that `fields` restricts the detail response.
+    """
+    response = authenticated_client.get(f"/tasks/{sample_task.id}/", {"fields": "status,title"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"id": sample_task.id, "title": sample_task.title, "status": sample_task.status}
+
+
+@pytest.mark.django_db
+def test_get_tasks_with_unknown_field(authenticated_client):
+    """
+    Test that asking for a field the endpoint doesn't expose is rejected.
+    """
+    response = authenticated_client.get("/tasks/", {"fields": "title,description"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "fields" in response.data["detail"]
+
+
+@pytest.mark.django_db
+def test_get_tasks_conditional_request(
+        authenticated_client, sample_task, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    """
+    Test that a list poll with a matching ETag gets a 304 answered from the cache alone,
+    that lists carry no Last-Modified, and that a change to the list changes the ETag.
+    """
+    response = authenticated_client.get("/tasks/")
+    etag = response["ETag"]
+    assert response.status_code == status.HTTP_200_OK
+    assert "Last-Modified" not in response
+
+    with django_assert_num_queries(0):
+        response = authenticated_client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+
+    response = authenticated_client.get("/tasks/", {"fields": "title"}, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.put(f"/tasks/{sample_task.id}/", {"title": "Changed Title"})
+    response = authenticated_client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_get_tasks_conditional_request_after_task_leaves_list(
+        authenticated_client, sample_task, django_capture_on_commit_callbacks
+):
+    """
+    Test that a filtered list poll isn't answered with a 304 once a task moved out of the
+    list, nor once a task was deleted, although no remaining task was modified.
+    """
+    other_task = Task.objects.create(owner=sample_task.owner, title="Other Task", description="Stays listed")
+    filters = {"status": TaskStatus.CREATED.value}
+    etag = authenticated_client.get("/tasks/", filters)["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post(
+            f"/tasks/{sample_task.id}/transition/", {"status": TaskStatus.IN_PROGRESS.value}
+        )
+    response = authenticated_client.get("/tasks/", filters, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert [task["title"] for task in response.data] == ["Other Task"]
+
+    etag = response["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.delete(f"/tasks/{other_task.id}/?hard_delete=true")
+    response = authenticated_client.get("/tasks/", filters, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == []
+
+
+@pytest.mark.django_db
+def test_get_task_details_conditional_request(authenticated_client, sample_task):
+    """
+    Test that a detail poll is answered with a 304 through its ETag, that a write made within
+    the same second changes it, and that `If-Modified-Since` doesn't short-circuit the check.
+    """
+    response = authenticated_client.get(f"/tasks/{sample_task.id}/")
+    assert response.status_code == status.HTTP_200_OK
+    assert "Last-Modified" not in response
+    etag = response["ETag"]
+
+    response = authenticated_client.get(f"/tasks/{sample_task.id}/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    authenticated_client.put(f"/tasks/{sample_task.id}/", {"title": "Renamed Task"})
+    response = authenticated_client.get(
+        f"/tasks/{sample_task.id}/", HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["title"] == "Renamed Task"
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_search_tasks(authenticated_client, test_user, another_user):
+    """
+    Test that searching ranks title matches first, highlights them and stays scoped to the owner.
+    """
+    title_match = Task.objects.create(owner=test_user, title="Deploy the invoices service", description="Run it")
+    description_match = Task.objects.create(
+        owner=test_user, title="Monthly chores", description="Send the invoices to the accountant"
+    )
+    Task.objects.create(owner=test_user, title="Unrelated", description="Water the plants")
+    Task.objects.create(owner=another_user, title="Invoices of someone else", description="Not visible")
+
+    response = authenticated_client.get("/tasks/", {"q": "invoice"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [task["id"] for task in response.data] == [title_match.id, description_match.id]
+    assert response.data[0]["rank"] > response.data[1]["rank"]
+    assert "<b>invoices</b>" in response.data[0]["title_highlight"]
+    assert "<b>invoices</b>" in response.data[1]["description_highlight"]
+
+
+@pytest.mark.django_db
+def test_search_tasks_rejects_cursor(authenticated_client, sample_task):
+    """
+    Test that search results can't be walked with a cursor.
+    """
+    cursor = encode_cursor((sample_task.created_at, sample_task.id))
+    response = authenticated_client.get("/tasks/", {"q": "sample", "cursor": cursor})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_get_task_stats_follows_task_writes(authenticated_client, test_user):
+    """
+    Test that the statistics follow creations, status changes, soft and hard deletions.
+    """
+    created_ids = [
+        authenticated_client.post("/tasks/", {"title": f"Task {index}", "description": "Counted"}).data["id"]
+        for index in range(4)
+    ]
+    authenticated_client.put(f"/tasks/{created_ids[0]}/", {"status": TaskStatus.DONE.value})
+    authenticated_client.delete(f"/tasks/{created_ids[1]}/")
+    authenticated_client.delete(f"/tasks/{created_ids[2]}/?hard_delete=true")
+
+    response = authenticated_client.get("/tasks/stats/")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["total"] == 3
+    assert response.data["active"] == 2
+    assert response.data["inactive"] == 1
+    assert response.data["by_status"][TaskStatus.CREATED.value] == 2
+    assert response.data["by_status"][TaskStatus.DONE.value] == 1
+    assert response.data["active_by_status"][TaskStatus.CREATED.value] == 1
+
+
+@pytest.mark.django_db
+def test_rebuild_task_counters(task_service, test_user, another_user):
+    """
+    Test that the rebuild command recomputes counters for tasks written outside of the service.
+    """
+    Task.objects.create(owner=test_user, title="Active", description="Written directly")
+    Task.objects.create(owner=test_user, title="Inactive", description="Written directly", active=False)
+    Task.objects.create(owner=another_user, title="Other", description="Written directly")
+    assert task_service.get_task_stats(test_user)["total"] == 0
+
+    call_command("rebuild_task_counters", stdout=StringIO())
+
+    stats = task_service.get_task_stats(test_user)
+    assert stats["total"] == 2
+    assert stats["active"] == 1
+    assert stats["inactive"] == 1
+    assert task_service.get_task_stats(another_user)["total"] == 1
+
+
+@pytest.mark.django_db
+def test_compiled_serializers_match_drf_output(test_user):
+    """
+    Test that the compiled serializers emit exactly what their DRF counterparts do,
+    across daylight saving time changes and for null values, from rows and instances.
+    """
+    expiries = [
+        None,
+        datetime(2018, 11, 4, 2, 59, 30, tzinfo=timezone.utc),
+        datetime(2018, 11, 4, 3, 0, 30, tzinfo=timezone.utc),
+        datetime(2019, 2, 17, 1, 59, tzinfo=timezone.utc),
+        datetime(2019, 2, 17, 2, 1, tzinfo=timezone.utc),
+        now(),
+    ]
+    for index, expires_at in enumerate(expiries):
+        Task.objects.create(
+            owner=test_user,
+            title=f"Task {index}",
+            description="Serialized twice",
+            status=TaskStatus.choices()[index % len(TaskStatus.choices())][0],
+            expires_at=expires_at,
+        )
+    tasks = list(Task.objects.filter(owner=test_user).order_by("id"))
+
+    for serializer_class in (TaskResponseSerializer, TaskDetailSerializer):
+        fields = serializer_class.Meta.fields
+        expected = serializer_class(tasks, many=True).data
+        rows = Task.objects.filter(owner=test_user).order_by("id").values_list(*fields)
+
+        compiled = serializer_class.compile(fields)
+        assert compiled.serialize_rows(rows) == expected
+        assert [compiled.serialize_instance(task) for task in tasks] == expected
+        assert json.dumps(compiled.serialize_rows(rows)) == json.dumps(expected)
+
+
+def test_compiled_serializers_are_reused():
+    """
+    Test that a serializer is compiled once per fieldset and active timezone.
+    """
+    fields = ["id", "title", "expires_at"]
+    compiled = TaskResponseSerializer.compile(fields)
+    assert TaskResponseSerializer.compile(list(fields)) is compiled
+    assert TaskResponseSerializer.compile(["id", "title"]) is not compiled
+    assert TaskDetailSerializer.compile(fields) is not compiled
+    with timezone_override("Asia/Tokyo"):
+        assert TaskResponseSerializer.compile(fields) is not compiled
+
+
+@pytest.mark.django_db
+def test_bulk_create_tasks(authenticated_client, test_user):
+    """
+    Test that bulk creation creates the valid tasks and reports the invalid ones by index.
+    """
+    payload = [
+        {"title": "First", "description": "Imported"},
+        {"title": "", "description": "Missing title"},
+        {"title": "Third", "description": "Imported", "status": TaskStatus.IN_PROGRESS.value},
+        "not a task",
+    ]
+    response = authenticated_client.post("/tasks/bulk/", payload, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert [item["index"] for item in response.data["created"]] == [0, 2]
+    assert [item["index"] for item in response.data["errors"]] == [1, 3]
+    assert "title" in response.data["errors"][0]["errors"]
+
+    created = {item["id"]: item["index"] for item in response.data["created"]}
+    tasks = Task.objects.filter(owner=test_user, id__in=created)
+    assert {task.title for task in tasks} == {"First", "Third"}
+
+    stats = authenticated_client.get("/tasks/stats/").data
+    assert stats["total"] == 2
+    assert stats["by_status"][TaskStatus.IN_PROGRESS.value] == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("payload", [
+    [{"description": "Missing title"}],
+    {"title": "Not a list", "description": "Rejected"},
+])
+def test_bulk_create_tasks_without_valid_items(authenticated_client, test_user, payload):
+    """
+    Test that bulk creation responds with 400 and creates nothing when no item is valid.
+    """
+    response = authenticated_client.post("/tasks/bulk/", payload, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not Task.objects.filter(owner=test_user).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_create_tasks_in_batches(authenticated_client, test_user, settings, django_assert_max_num_queries):
+    """
+    Test that bulk creation inserts the tasks in batches rather than one at a time.
+    """
+    settings.TASKS_BULK_CREATE_BATCH_SIZE = 10
+    payload = [{"title": f"Task {index}", "description": "Imported"} for index in range(25)]
+    with django_assert_max_num_queries(10):
+        response = authenticated_client.post("/tasks/bulk/", payload, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert Task.objects.filter(owner=test_user).count() == 25
+
+
+@pytest.mark.django_db
+def test_bulk_update_status(authenticated_client, test_user, another_user, django_assert_max_num_queries):
+    """
+    Test that the bulk status change updates the user's tasks in one statement and
+    reports changed, unchanged, rejected, missing and unauthorized IDs.
+    """
+    authenticated_client.post("/tasks/bulk/", [
+        {"title": "Todo", "description": "Bulk"},
+        {"title": "Done", "description": "Bulk", "status": TaskStatus.DONE.value},
+    ], format="json")
+    todo, done = Task.objects.filter(owner=test_user).order_by("id")
+    expired = Task.objects.create(
+        owner=test_user, title="Expired", description="Bulk", status=TaskStatus.EXPIRED.value
+    )
+    foreign = Task.objects.create(owner=another_user, title="Foreign", description="Not yours")
+    missing_id = foreign.id + 1000
+
+    with django_assert_max_num_queries(6):
+        response = authenticated_client.post("/tasks/bulk-status/", {
+            "ids": [todo.id, done.id, expired.id, foreign.id, missing_id, todo.id],
+            "status": TaskStatus.DONE.value,
+        }, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        "changed": [todo.id],
+        "unchanged": [done.id],
+        "rejected": [expired.id],
+        "missing": [missing_id],
+        "unauthorized": [foreign.id],
+    }
+    todo.refresh_from_db()
+    foreign.refresh_from_db()
+    assert todo.status == TaskStatus.DONE.value
+    assert foreign.status == TaskStatus.CREATED.value
+    assert authenticated_client.get("/tasks/stats/").data["by_status"][TaskStatus.DONE.value] == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("hard_delete", [False, True])
+def test_bulk_delete_tasks(authenticated_client, test_user, another_user, hard_delete):
+    """
+    Test that the bulk deletion deletes the user's tasks and reports missing and unauthorized IDs.
+    """
+    authenticated_client.post("/tasks/bulk/", [
+        {"title": "First", "description": "Bulk"},
+        {"title": "Second", "description": "Bulk", "status": TaskStatus.DONE.value},
+        {"title": "Kept", "description": "Bulk"},
+    ], format="json")
+    first, second, kept = Task.objects.filter(owner=test_user).order_by("id")
+    foreign = Task.objects.create(owner=another_user, title="Foreign", description="Not yours")
+    missing_id = foreign.id + 1000
+
+    response = authenticated_client.post("/tasks/bulk-delete/", {
+        "ids": [first.id, second.id, foreign.id, missing_id],
+        "hard_delete": hard_delete,
+    }, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        "deleted": [first.id, second.id],
+        "missing": [missing_id],
+        "unauthorized": [foreign.id],
+    }
+    assert Task.objects.filter(id=foreign.id, active=True).exists()
+    assert Task.objects.filter(id=kept.id, active=True).exists()
+    if hard_delete:
+        assert not Task.objects.filter(id__in=[first.id, second.id]).exists()
+    else:
+        assert Task.objects.filter(id__in=[first.id, second.id], active=False).count() == 2
+
+    stats = authenticated_client.get("/tasks/stats/").data
+    assert stats["active"] == 1
+    assert stats["inactive"] == (0 if hard_delete else 2)
+
+
+@pytest.mark.django_db
+def test_soft_delete_queryset(test_user):
+    """
+    Test that the queryset soft delete only deactivates active tasks, in a single statement.
+    """
+    active = Task.objects.create(owner=test_user, title="Active", description="Soft deleted")
+    inactive = Task.objects.create(owner=test_user, title="Inactive", description="Already", active=False)
+
+    rows = Task.objects.filter(id__in=[active.id, inactive.id]).soft_delete()
+
+    assert rows == [(active.id, test_user.id, active.status)]
+    assert not Task.objects.filter(active=True).exists()
+
+
+@pytest.mark.django_db
+def test_get_task_details_loads_task_once(authenticated_client, sample_task, task_service, test_user,
+                                          django_assert_num_queries):
+    """
+    Test that a detail request reads the task in a single query without loading its owner,
+    and that a service never loads the same task twice.
+    """
+    with django_assert_num_queries(1) as context:
+        response = authenticated_client.get(f"/tasks/{sample_task.id}/")
+    assert response.status_code == status.HTTP_200_OK
+    assert "users_user" not in context.captured_queries[0]["sql"]
+
+    with django_assert_num_queries(1):
+        task = task_service.get_task_details(sample_task.id, test_user, fields=["id", "title"])
+        assert task_service.get_task_details(sample_task.id, test_user, fields=["title"]) is task
+
+    with django_assert_num_queries(1):
+        assert task_service.get_task_details(sample_task.id, test_user).description == sample_task.description
+
+
+@pytest.mark.django_db
+def test_update_task_only_writes_modified_fields(task_repository, sample_task, django_assert_num_queries):
+    """
+    Test that a status change is a single UPDATE of the modified columns that bumps the version.
+    """
+    with django_assert_num_queries(1) as context:
+        task = task_repository.update_task_status(sample_task, TaskStatus.DONE.value)
+
+    sql = context.captured_queries[0]["sql"]
+    assert sql.startswith("UPDATE")
+    assert '"status"' in sql
+    assert '"description"' not in sql and '"title"' not in sql
+    assert task.version == 2
+    sample_task.refresh_from_db()
+    assert sample_task.status == TaskStatus.DONE.value
+    assert sample_task.version == 2
+
+
+@pytest.mark.django_db
+def test_update_task_version_conflict(authenticated_client, sample_task):
+    """
+    Test that an update based on a stale version is rejected with 409 and changes nothing.
+    """
+    response = authenticated_client.put(f"/tasks/{sample_task.id}/", {"title": "First", "version": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["version"] == 2
+
+    response = authenticated_client.put(f"/tasks/{sample_task.id}/", {"title": "Second", "version": 1})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    sample_task.refresh_from_db()
+    assert sample_task.title == "First"
+    assert sample_task.version == 2
+
+
+@pytest.mark.django_db
+def test_task_save_checks_version(sample_task, django_assert_num_queries):
+    """
+    Test that saving a task is a single UPDATE conditional on its loaded version, and that
+    saving a stale copy, even through a soft delete, raises a conflict and changes nothing.
+    """
+    stale_task = Task.objects.get(id=sample_task.id)
+
+    sample_task.title = "First"
+    with django_assert_num_queries(1) as context:
+        sample_task.save()
+    assert context.captured_queries[0]["sql"].startswith("UPDATE")
+    assert '"version" = 1' in context.captured_queries[0]["sql"]
+    assert sample_task.version == 2
+
+    stale_task.title = "Second"
+    with pytest.raises(TaskVersionConflictException):
+        stale_task.save()
+    assert stale_task.version == 1
+    with pytest.raises(TaskVersionConflictException):
+        stale_task.delete()
+
+    sample_task.refresh_from_db()
+    assert sample_task.title == "First"
+    assert sample_task.active is True
+    assert sample_task.version == 2
+
+
+@pytest.mark.django_db
+def test_transition_task(authenticated_client, sample_task, django_assert_max_num_queries):
+    """
+    Test that a transition allowed by the state machine is applied and returns the new state.
+    """
+    with django_assert_max_num_queries(4):
+        response = authenticated_client.post(
+            f"/tasks/{sample_task.id}/transition/", {"status": TaskStatus.IN_PROGRESS.value}
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["status"] == TaskStatus.IN_PROGRESS.value
+    assert response.data["version"] == 2
+    assert response.data["title"] == sample_task.title
+
+    sample_task.refresh_from_db()
+    assert sample_task.status == TaskStatus.IN_PROGRESS.value
+    assert sample_task.version == 2
+
+
+@pytest.mark.django_db
+def test_transition_task_errors(authenticated_client, sample_task, another_user):
+    """
+    Test that disallowed transitions are rejected with 409, and missing or foreign tasks
+    with 404 and 403, without modifying anything.
+    """
+    sample_task.status = TaskStatus.EXPIRED.value
+    sample_task.save()
+    foreign = Task.objects.create(owner=another_user, title="Foreign", description="Not yours")
+
+    response = authenticated_client.post(
+        f"/tasks/{sample_task.id}/transition/", {"status": TaskStatus.IN_PROGRESS.value}
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+    response = authenticated_client.put(f"/tasks/{sample_task.id}/", {"status": TaskStatus.IN_PROGRESS.value})
+    assert response.status_code == status.HTTP_409_CONFLICT
+    response = authenticated_client.post(f"/tasks/{foreign.id}/transition/", {"status": TaskStatus.DONE.value})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = authenticated_client.post(
+        f"/tasks/{foreign.id + 1000}/transition/", {"status": TaskStatus.DONE.value}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    sample_task.refresh_from_db()
+    foreign.refresh_from_db()
+    assert sample_task.status == TaskStatus.EXPIRED.value
+    assert foreign.status == TaskStatus.CREATED.value
+
+
+@pytest.mark.django_db(transaction=True)
+def test_transition_task_leaves_foreign_tasks_unlocked(task_repository, test_user, another_user):
+    """
+    Test that posting a transition for another user's task takes no lock on it.
+    """
+    foreign = Task.objects.create(owner=another_user, title="Foreign", description="Not yours")
+    locked = []
+
+    def try_lock():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT id FROM {Task._meta.db_table} WHERE id = %s FOR UPDATE NOWAIT", [foreign.id])
+            locked.append(False)
+        except OperationalError:
+            locked.append(True)
+        finally:
+            connection.close()
+
+    with transaction.atomic():
+        assert task_repository.transition_task(foreign.id, test_user.id, TaskStatus.DONE.value) == (None, None)
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    assert locked == [False]
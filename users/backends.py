@@ -0,0 +1,101 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+
+from users.hashing import get_password_hashing_pool
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    `ModelBackend` verifying passwords in the password hashing pool.
+
+    The user is read and, when its hash was made with other hasher parameters, rehashed
+    and saved on the request thread, in its transaction; only the hashing runs in the pool.
+    Async views authenticate through `aauthenticate`, which awaits the pool instead.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        pool = get_password_hashing_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so response times don't tell which users exist.
+            pool.run(make_password, password)
+            return None
+
+        if not pool.run(check_password, password, user.password) or not self.user_can_authenticate(user):
+            return None
+        if self.must_rehash(user.password):
+            user.password = pool.run(make_password, password)
+            user.save(update_fields=["password"])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        `authenticate` awaiting the hashes, for async views. The user is read and saved
+        through the async ORM.
+        """
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        pool = get_password_hashing_pool()
+        try:
+            user = await UserModel._default_manager.aget(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            await pool.run_async(make_password, password)
+            return None
+
+        if not await pool.run_async(check_password, password, user.password) or not self.user_can_authenticate(user):
+            return None
+        if self.must_rehash(user.password):
+            user.password = await pool.run_async(make_password, password)
+            await user.asave(update_fields=["password"])
+        return user
+
+    @staticmethod
+    def must_rehash(encoded: str) -> bool:
+        """
+        Whether a hash wasn't made by the preferred hasher with its current parameters.
+        """
+        preferred = get_hasher("default")
+        return identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    Async `django.contrib.auth.authenticate`. Django's own `aauthenticate` runs the sync
+    backends in the thread shared by sync code; backends providing `aauthenticate` are
+    awaited here instead, so their hashing doesn't hold that thread.
+    """
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        try:
+            if hasattr(backend, "aauthenticate"):
+                user = await backend.aauthenticate(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is not None:
+            user.backend = backend_path
+            return user
+
+    await user_login_failed.asend(
+        sender=__name__,
+        credentials={key: value for key, value in credentials.items() if key != "password"},
+        request=request,
+    )
+    return None
@@ -0,0 +1,48 @@
+import logging
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Short-lived cache of users by ID, sparing authenticated requests the user lookup.
+
+    Entries only hold the fields authentication and most views read, and a fingerprint of
+    the password hash to check revoked tokens against, never the hash itself. Users are
+    rebuilt from them as if loaded with only these fields, the others are loaded on access.
+
+    Entries are invalidated when a user is saved or deleted through the ORM, see
+    `users.signals`; writes bypassing the signals, such as `QuerySet.update`, are only
+    picked up once the entry times out.
+    """
+    KEY = "users:user:{user_id}"
+    FIELDS = ["id", "name", "email", "is_active", "is_staff"]
+
+    def __init__(self, timeout: Optional[int] = None):
+        self.timeout = timeout if timeout is not None else settings.AUTH_USER_CACHE_TIMEOUT
+
+    def get(self, user_id: int) -> Optional[Tuple[User, str]]:
+        """
+        :return: A tuple with the cached user and the fingerprint of its password hash,
+            or None when the user isn't cached.
+        """
+        entry = cache.get(self.KEY.format(user_id=user_id))
+        if entry is None:
+            return None
+        *values, password_fingerprint = entry
+        return User.from_db("default", self.FIELDS, values), password_fingerprint
+
+    def set(self, user: User) -> None:
+        entry = [getattr(user, field) for field in self.FIELDS] + [get_md5_hash_password(user.password)]
+        cache.set(self.KEY.format(user_id=user.pk), entry, timeout=self.timeout)
+
+    def invalidate(self, user_id: int) -> None:
+        cache.delete(self.KEY.format(user_id=user_id))
+        logger.debug(f"Invalidated cached user ID {user_id}.")
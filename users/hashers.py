@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 hasher whose iterations come from `PASSWORD_HASHER_ITERATIONS`.
+
+    It shares the algorithm name of Django's hasher, so existing hashes keep verifying,
+    and `must_update` flags hashes made with other iterations, which are rehashed with
+    the current ones on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_ITERATIONS
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+
+from utils.exceptions import PasswordHashingUnavailableException
+
+
+class PasswordHashingPool:
+    """
+    Bounded thread pool running password hashing off the request threads.
+
+    PBKDF2 releases the GIL, so up to `threads` hashes run in parallel, one per core, while
+    at most `queue_size` more wait for a thread. Beyond that, callers are turned away after
+    `timeout` seconds with `PasswordHashingUnavailableException`, instead of every login
+    of a burst queuing behind the hasher and holding a worker thread meanwhile.
+    """
+
+    def __init__(self, threads: int, queue_size: int, timeout: float):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="password-hashing")
+        self.slots = threading.BoundedSemaphore(threads + queue_size)
+        self.timeout = timeout
+
+    # Seconds between two attempts of `run_async` at taking a slot.
+    POLL_INTERVAL = 0.01
+
+    def run(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Run `function` in the pool and return its result. The calling thread waits for it,
+        see `run_async` to hash without holding it.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PasswordHashingUnavailableException()
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    async def run_async(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Run `function` in the pool and await its result, leaving the event loop free to
+        serve other requests meanwhile. Slots are shared with `run`, and only released
+        once the hash is over, even when the caller stops awaiting it.
+        """
+        deadline = time.monotonic() + self.timeout
+        while not self.slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise PasswordHashingUnavailableException()
+            await asyncio.sleep(self.POLL_INTERVAL)
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+
+_pool: Optional[PasswordHashingPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_password_hashing_pool() -> PasswordHashingPool:
+    """
+    The pool of the current process, created on first use from the settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    threads=settings.PASSWORD_HASHING_THREADS,
+                    queue_size=settings.PASSWORD_HASHING_QUEUE_SIZE,
+                    timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT,
+                )
+    return _pool
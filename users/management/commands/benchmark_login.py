@@ -0,0 +1,71 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the throughput and latency of logins through the token endpoint for each "
+        "password hashing profile, with concurrent clients. A throwaway user with a unique "
+        "email is created for each profile and deleted after it, and rate limiting is disabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles", nargs="+", choices=sorted(settings.PASSWORD_HASHING_PROFILES),
+            default=list(settings.PASSWORD_HASHING_PROFILES), help="Hashing profiles to measure.",
+        )
+        parser.add_argument("--logins", type=int, default=20, help="Number of logins per profile.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent clients.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Hashing pool: {settings.PASSWORD_HASHING_THREADS} threads, "
+            f"{options['concurrency']} concurrent clients."
+        )
+        middleware = [name for name in settings.MIDDLEWARE if not name.endswith("RateLimitMiddleware")]
+        # Logins run on connections of their own, so the user is committed, under an address
+        # no real account can have.
+        credentials = {"email": f"benchmark-login-{uuid.uuid4().hex}@example.invalid", "password": "benchmark-password"}
+
+        for profile in options["profiles"]:
+            iterations = settings.PASSWORD_HASHING_PROFILES[profile]
+            with override_settings(PASSWORD_HASHER_ITERATIONS=iterations, MIDDLEWARE=middleware):
+                user = User.objects.create_user(name="Benchmark", **credentials)
+                try:
+                    timings, elapsed = self._run(credentials, options["logins"], options["concurrency"])
+                finally:
+                    user.delete()
+
+            timings.sort()
+            self.stdout.write(
+                f"{profile:>12} ({iterations} iterations): {len(timings) / elapsed:6.2f} logins/s, "
+                f"p50 {timings[len(timings) // 2] * 1000:7.1f} ms, "
+                f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.1f} ms, "
+                f"mean {statistics.mean(timings) * 1000:7.1f} ms"
+            )
+
+    @staticmethod
+    def _run(credentials, logins: int, concurrency: int):
+        def login(_):
+            started = time.perf_counter()
+            response = Client().post("/token/", credentials)
+            timing = time.perf_counter() - started
+            connections.close_all()
+            if response.status_code != 200:
+                raise RuntimeError(f"Login failed with status {response.status_code}: {response.content!r}")
+            return timing
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            timings = list(executor.map(login, range(logins)))
+        return timings, time.perf_counter() - started
@@ -1,4 +1,7 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+
+from users.hashing import get_password_hashing_pool
 
 
 class UserManager(BaseUserManager):
@@ -9,7 +12,7 @@ class UserManager(BaseUserManager):
             raise ValueError("The Name field must be set.")
         email = self.normalize_email(email)
         user = self.model(name=name, email=email, **extra_fields)
-        user.set_password(password)
+        user.password = get_password_hashing_pool().run(make_password, password)
         user.save(using=self._db)
         return user
 
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.cache import UserCache
+from users.models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance: User, **kwargs):
+    """
+    Drop the cached user once the current transaction commits, so a concurrent request
+    can't cache it again with pre-commit data.
+    """
+    user_id = instance.pk
+    transaction.on_commit(lambda: UserCache().invalidate(user_id), robust=True)
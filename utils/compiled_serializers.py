@@ -0,0 +1,145 @@
+import re
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# strftime directives the datetime fast path knows how to inline, as str.format fields.
+_INLINE_DIRECTIVES = {
+    "d": "{0.day:02d}",
+    "m": "{0.month:02d}",
+    "Y": "{0.year:04d}",
+    "y": "{1:02d}",
+    "H": "{0.hour:02d}",
+    "M": "{0.minute:02d}",
+    "S": "{0.second:02d}",
+    "%": "%",
+}
+_DIRECTIVE = re.compile(r"%(.)")
+
+# Upper bound of memoized datetime representations per compiled field.
+_DATETIME_MEMO_SIZE = 65536
+
+
+def _compile_strftime(output_format: str) -> Callable[[datetime], str]:
+    """
+    Turn a strftime format into an equivalent `str.format` template when it only uses
+    directives that don't depend on the locale, falling back to `strftime` otherwise.
+    """
+    directives = _DIRECTIVE.findall(output_format)
+    if not all(directive in _INLINE_DIRECTIVES for directive in directives):
+        return lambda value: value.strftime(output_format)
+
+    literal = output_format.replace("{", "{{").replace("}", "}}")
+    template = _DIRECTIVE.sub(lambda match: _INLINE_DIRECTIVES[match.group(1)], literal).format
+    return lambda value: template(value, value.year % 100)
+
+
+def _compile_datetime(field: serializers.DateTimeField) -> Optional[Callable[[Any], Any]]:
+    """
+    Compile `DateTimeField.to_representation`, resolving the output format and timezone once.
+
+    Representations are memoized per UTC minute when the format has minute precision,
+    since rows commonly share the same expiry minute.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return None
+
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+    def localize(value: datetime) -> datetime:
+        if field_timezone is None:
+            return value
+        if timezone.is_aware(value):
+            return value.astimezone(field_timezone)
+        return field.enforce_timezone(value)
+
+    if output_format.lower() == ISO_8601:
+        def to_iso(value):
+            if isinstance(value, str):
+                return value
+            value = localize(value).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return to_iso
+
+    render = _compile_strftime(output_format)
+    if "%S" in output_format or "%f" in output_format:
+        return lambda value: value if isinstance(value, str) else render(localize(value))
+
+    memo: Dict[int, str] = {}
+
+    def to_minute_precision(value):
+        if isinstance(value, str):
+            return value
+        local = localize(value)
+        offset = local.utcoffset()
+        if value.tzinfo is None or offset is None or offset.seconds % 60:
+            return render(local)
+        key = int(value.timestamp()) // 60
+        representation = memo.get(key)
+        if representation is None:
+            if len(memo) >= _DATETIME_MEMO_SIZE:
+                memo.clear()
+            representation = memo[key] = render(local)
+        return representation
+
+    return to_minute_precision
+
+
+def _compile_field(field: serializers.Field) -> Optional[Callable[[Any], Any]]:
+    """
+    Return the conversion of a non-null value for a serializer field, or None when
+    the value is emitted as is.
+    """
+    if isinstance(field, serializers.DateTimeField):
+        return _compile_datetime(field)
+    if isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        return lambda value: value if value == "" else choices.get(str(value), value)
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.CharField):
+        return str
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Read-only fast path producing exactly the representation of a DRF serializer.
+
+    Field lookups, output formats and timezones are resolved once, instead of for every
+    field of every object, and rows fetched with `values_list()` are serialized without
+    building model instances.
+    """
+
+    def __init__(self, serializer: serializers.Serializer):
+        fields = list(serializer._readable_fields)
+        self.field_names = tuple(field.field_name for field in fields)
+        self.converters = tuple(_compile_field(field) for field in fields)
+        sources = [field.source for field in fields]
+        getter = attrgetter(*sources)
+        self._get_values = getter if len(sources) > 1 else lambda instance: (getter(instance),)
+
+    def serialize_row(self, row: Sequence) -> Dict:
+        """
+        Serialize a row holding the serializer fields in order. Trailing extra columns are ignored.
+        """
+        return {
+            name: value if convert is None or value is None else convert(value)
+            for name, convert, value in zip(self.field_names, self.converters, row)
+        }
+
+    def serialize_rows(self, rows: Iterable[Sequence]) -> List[Dict]:
+        serialize_row = self.serialize_row
+        return [serialize_row(row) for row in rows]
+
+    def serialize_instance(self, instance) -> Dict:
+        return self.serialize_row(self._get_values(instance))
@@ -0,0 +1,48 @@
+import hashlib
+import json
+from typing import Optional
+
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+class ConditionalValidators:
+    """
+    ETag validator of a resource representation, computed from the values it was built
+    from, or from the built representation itself.
+
+    There is no Last-Modified validator: HTTP dates only have whole-second precision, so a
+    write made in the same second as a fetch would be answered with a 304.
+    """
+
+    def __init__(self, *parts, etag: Optional[str] = None):
+        """
+        :param parts: Every value the representation depends on (owner, filters, row versions...),
+            or the representation itself.
+        :param etag: A previously computed ETag, stored along with the representation, used instead of `parts`.
+        """
+        if etag is None:
+            digest = hashlib.md5(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+            etag = "W/" + quote_etag(digest)
+        self.etag = etag
+
+    def evaluate(self, request) -> Optional[HttpResponseBase]:
+        """
+        Evaluate the request preconditions, returning the 304 (or 412) response to send
+        instead of the full one, or None when the full response is needed.
+        """
+        response = get_conditional_response(request, etag=self.etag)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response: HttpResponseBase) -> HttpResponseBase:
+        """
+        Attach the validators to a response. The representation is private to the
+        authenticated user and must be revalidated before reuse.
+        """
+        response["ETag"] = self.etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+        return response
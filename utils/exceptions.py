@@ -39,3 +39,27 @@ class TaskUnauthorizedAccessException(ExceptionMessageBuilder):
         self.message = "You are not authorized to access this task."
         self.status_code = status.HTTP_403_FORBIDDEN
         self.detail = {"title": self.title, "message": self.message}
+
+
+class TaskInvalidTransitionException(ExceptionMessageBuilder):
+    def __init__(self, task_id: int, current_status: str, new_status: str):
+        self.title = "Invalid Status Transition"
+        self.message = f"Task with ID {task_id} can't move from {current_status} to {new_status}."
+        self.status_code = status.HTTP_409_CONFLICT
+        self.detail = {"title": self.title, "message": self.message}
+
+
+class TaskVersionConflictException(ExceptionMessageBuilder):
+    def __init__(self, task_id: int):
+        self.title = "Task Version Conflict"
+        self.message = f"Task with ID {task_id} was modified by another request. Fetch it again before updating it."
+        self.status_code = status.HTTP_409_CONFLICT
+        self.detail = {"title": self.title, "message": self.message}
+
+
+class PasswordHashingUnavailableException(ExceptionMessageBuilder):
+    def __init__(self):
+        self.title = "Service Unavailable"
+        self.message = "Too many password checks are in progress. Try again in a moment."
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.detail = {"title": self.title, "message": self.message}
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from utils.middlewares import RateLimitMiddleware
+from utils.rate_limit import ALGORITHMS, RateLimitPolicy
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the overhead per request of the rate limit middleware against the configured "
+        "Redis, spreading requests over distinct client IPs so none of them gets limited. "
+        "Requests go through a copy of the default policy counting under its own name, with each "
+        "algorithm in turn unless one is given, and optionally with local leases."
+    )
+    # Counters go in a namespace of their own, deleted after each run, away from live clients' ones.
+    POLICY_NAME = "benchmark"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=10_000, help="Number of requests to time.")
+        parser.add_argument("--clients", type=int, default=1_000, help="Number of distinct client IPs.")
+        parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), help="Only time this algorithm.")
+        parser.add_argument("--lease", type=int, default=0, help="Units leased per Redis round trip, 0 for none.")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        client_ips = [
+            f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}" for index in range(options["clients"])
+        ]
+        requests = []
+        for index in range(options["requests"]):
+            request = factory.get("/")
+            request.META["REMOTE_ADDR"] = client_ips[index % len(client_ips)]
+            requests.append(request)
+
+        for algorithm in [options["algorithm"]] if options["algorithm"] else ALGORITHMS:
+            default_policy = {
+                **settings.RATE_LIMIT_DEFAULT_POLICY,
+                "name": self.POLICY_NAME,
+                "algorithm": algorithm,
+                "key": "ip",
+                "lease": options["lease"],
+            }
+            with override_settings(RATE_LIMIT_DEFAULT_POLICY=default_policy, RATE_LIMIT_POLICIES=[]):
+                middleware = RateLimitMiddleware(lambda request: HttpResponse("OK"))
+            self._report(algorithm, middleware, requests)
+
+    def _report(self, algorithm: str, middleware: RateLimitMiddleware, requests) -> None:
+        timings = []
+        try:
+            for request in requests:
+                started = time.perf_counter()
+                middleware(request)
+                timings.append(time.perf_counter() - started)
+        finally:
+            cache.delete_pattern(RateLimitPolicy.KEY.format(name=self.POLICY_NAME, identity="*"))
+
+        timings.sort()
+        self.stdout.write(
+            f"{algorithm:>22}: {len(timings)} requests, mean {statistics.mean(timings) * 1e6:.1f} µs, "
+            f"p50 {timings[len(timings) // 2] * 1e6:.1f} µs, p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} µs "
+            f"per request, {len(timings) / sum(timings):.0f} requests/s"
+        )
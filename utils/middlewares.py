@@ -1,41 +1,114 @@
-import time
+import math
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.http import JsonResponse
-from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from utils.rate_limit import LocalLeases, RateLimitPolicy
 
 
 class RateLimitMiddleware:
+    """
+    Rate limit requests according to the first of `RATE_LIMIT_POLICIES` matching their URL
+    name and method, or to `RATE_LIMIT_DEFAULT_POLICY`, and describe the client's quota in
+    `RateLimit-*` headers.
+
+    Checking and counting a request takes a single atomic Redis round trip, so concurrent
+    requests can't go past the limit, unless its policy leases units to spend in process
+    through `LocalLeases`. Policies keyed on the user identify it from the
+    access token without querying the database, and fall back to the client IP for
+    anonymous requests.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.policies = [RateLimitPolicy(**policy) for policy in settings.RATE_LIMIT_POLICIES]
+        self.default_policy = RateLimitPolicy(**settings.RATE_LIMIT_DEFAULT_POLICY)
+        self.match_url_names = any(policy.url_names is not None for policy in self.policies)
+        self.leases = None
+        if any(policy.lease for policy in [*self.policies, self.default_policy]):
+            self.leases = LocalLeases(settings.RATE_LIMIT_LEASE_CACHE_SIZE)
+        self.jwt_authentication = JWTAuthentication()
 
     def __call__(self, request):
-        client_ip = self.get_client_ip(request)
-        cache_key = f"rate_limit:{client_ip}"
-        request_limit = 100
-        time_window = 60
-
-        data = cache.get(cache_key, {"count": 0, "start_time": time.time()})
-        current_time = time.time()
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        policy, result = self.hit(request)
+        response = self.get_response(request) if result.allowed else self.limit_exceeded(result)
+        return self.add_headers(response, policy, result)
 
-        if current_time - data["start_time"] > time_window:
-            data = {"count": 1, "start_time": current_time}
-        else:
-            data["count"] += 1
+    async def __acall__(self, request):
+        """
+        Under ASGI, run the Redis round trip off the thread shared by sync code, so the rest
+        of the chain stays async.
+        """
+        policy, result = await sync_to_async(self.hit, thread_sensitive=False)(request)
+        response = await self.get_response(request) if result.allowed else self.limit_exceeded(result)
+        return self.add_headers(response, policy, result)
 
-        if data["count"] > request_limit:
-            retry_after = int(time_window - (current_time - data["start_time"]))
-            return JsonResponse(
-                {
-                    "error": "Rate limit exceeded",
-                    "retry_after": retry_after,
-                },
-                status=429,
-            )
+    def hit(self, request):
+        policy = self.get_policy(request)
+        return policy, policy.hit(self.get_identity(request, policy), self.leases)
 
-        cache.set(cache_key, data, timeout=time_window)
+    @staticmethod
+    def limit_exceeded(result):
+        return JsonResponse(
+            {
+                "error": "Rate limit exceeded",
+                "retry_after": math.ceil(result.retry_after),
+            },
+            status=429,
+        )
 
-        response = self.get_response(request)
+    @staticmethod
+    def add_headers(response, policy: RateLimitPolicy, result):
+        for header, value in policy.headers(result).items():
+            response[header] = value
         return response
 
+    def get_policy(self, request) -> RateLimitPolicy:
+        url_name = None
+        if self.match_url_names:
+            try:
+                url_name = resolve(request.path_info).view_name
+            except Resolver404:
+                pass
+        for policy in self.policies:
+            if policy.matches(url_name, request.method):
+                return policy
+        return self.default_policy
+
+    def get_identity(self, request, policy: RateLimitPolicy) -> str:
+        if policy.key == "user":
+            user_id = self.get_token_user_id(request)
+            if user_id is not None:
+                return f"user:{user_id}"
+        return f"ip:{self.get_client_ip(request)}"
+
+    def get_token_user_id(self, request):
+        """Get the user ID claim of a valid access token, without loading the user."""
+        header = self.jwt_authentication.get_header(request)
+        if header is None:
+            return None
+        try:
+            raw_token = self.jwt_authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+            token = self.jwt_authentication.get_validated_token(raw_token)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+        return token.get(jwt_settings.USER_ID_CLAIM)
+
     @staticmethod
     def get_client_ip(request):
         """Get the client's IP address from the request."""
@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+
+from rest_framework import serializers
+
+
+def encode_cursor(position: Tuple[datetime, int]) -> str:
+    """
+    Encode a `(created_at, id)` keyset position into an opaque, URL-safe cursor.
+    """
+    created_at, object_id = position
+    payload = json.dumps([created_at.isoformat(), object_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, object_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(object_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+class CursorField(serializers.Field):
+    """
+    Serializer field that exposes a keyset position as an opaque cursor string.
+    """
+    default_error_messages = {
+        "invalid": "Invalid cursor.",
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail("invalid")
+        try:
+            return decode_cursor(data)
+        except ValueError:
+            self.fail("invalid")
+
+    def to_representation(self, value):
+        return encode_cursor(value)
@@ -0,0 +1,319 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Type
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    # Units left once the request is counted.
+    remaining: int
+    # Seconds until the spent units are available again.
+    reset: float
+    # Seconds to wait before the request can be allowed, 0 when it was.
+    retry_after: float
+
+
+class RateLimitAlgorithm:
+    """
+    A rate limiting algorithm, run as a Lua script so that checking and counting a request
+    is atomic and takes a single Redis round trip.
+
+    Scripts get the limit, the period in milliseconds and the cost of the request as
+    arguments, and return whether it's allowed, the remaining units, and the milliseconds
+    until the reset and before a retry.
+    """
+    SCRIPT: str = ""
+
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+        self._script = None
+
+    def hit(self, key: str, limit: int, period: int, cost: int = 1) -> RateLimitResult:
+        """
+        Count a request costing `cost` units against `limit` units per `period` seconds.
+        """
+        if self._script is None:
+            self._script = get_redis_connection(self.alias).register_script(self.SCRIPT)
+        allowed, remaining, reset, retry_after = self._script(keys=[key], args=[limit, period * 1000, cost])
+        return RateLimitResult(bool(allowed), max(int(remaining), 0), reset / 1000, retry_after / 1000)
+
+
+class FixedWindow(RateLimitAlgorithm):
+    """
+    Counter reset every period, starting at the first request. Cheapest, but a client can
+    spend twice the limit around the end of a window.
+    """
+    SCRIPT = """
+    local limit, period, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local count = redis.call('INCRBY', KEYS[1], cost)
+    local ttl = redis.call('PTTL', KEYS[1])
+    if ttl < 0 then
+        redis.call('PEXPIRE', KEYS[1], period)
+        ttl = period
+    end
+    if count > limit then
+        redis.call('DECRBY', KEYS[1], cost)
+        return {0, limit - count + cost, ttl, ttl}
+    end
+    return {1, limit - count, ttl, 0}
+    """
+
+
+class SlidingWindowLog(RateLimitAlgorithm):
+    """
+    Sorted set of the timestamps of the requests of the last period. Exact, at the cost
+    of one entry per unit spent.
+    """
+    SCRIPT = """
+    redis.replicate_commands()
+    local limit, period, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local time = redis.call('TIME')
+    local now = time[1] * 1000 + math.floor(time[2] / 1000)
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - period)
+    local count = redis.call('ZCARD', KEYS[1])
+    if count + cost > limit then
+        local retry_after = period
+        local needed = count + cost - limit
+        if needed <= count then
+            local entry = redis.call('ZRANGE', KEYS[1], needed - 1, needed - 1, 'WITHSCORES')
+            retry_after = tonumber(entry[2]) + period - now
+        end
+        local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+        local reset = oldest[2] and tonumber(oldest[2]) + period - now or 0
+        return {0, limit - count, reset, retry_after}
+    end
+    for unit = 1, cost do
+        redis.call('ZADD', KEYS[1], now, time[1] .. time[2] .. ':' .. (count + unit))
+    end
+    redis.call('PEXPIRE', KEYS[1], period)
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {1, limit - count - cost, tonumber(oldest[2]) + period - now, 0}
+    """
+
+
+class SlidingWindowCounter(RateLimitAlgorithm):
+    """
+    Counters of the current and previous fixed windows, the previous one weighted by how
+    much of it still overlaps the last period. Approximate, with constant memory.
+    """
+    SCRIPT = """
+    redis.replicate_commands()
+    local limit, period, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local time = redis.call('TIME')
+    local now = time[1] * 1000 + math.floor(time[2] / 1000)
+    local window = math.floor(now / period)
+    local elapsed = now - window * period
+    local counts = redis.call('HMGET', KEYS[1], window - 1, window)
+    local previous, current = tonumber(counts[1]) or 0, tonumber(counts[2]) or 0
+    local estimate = previous * (period - elapsed) / period + current
+    if estimate + cost > limit then
+        local retry_after = period - elapsed
+        if current + cost <= limit and previous > 0 then
+            retry_after = math.ceil((estimate + cost - limit) * period / previous)
+        end
+        return {0, math.floor(limit - estimate), period - elapsed, retry_after}
+    end
+    redis.call('HINCRBY', KEYS[1], window, cost)
+    redis.call('HDEL', KEYS[1], window - 2)
+    redis.call('PEXPIRE', KEYS[1], period * 2)
+    return {1, math.floor(limit - estimate - cost), period - elapsed, 0}
+    """
+
+
+class TokenBucket(RateLimitAlgorithm):
+    """
+    Bucket of `limit` tokens refilled continuously over the period. Allows bursts up to
+    the limit, then smooths requests to the refill rate.
+    """
+    SCRIPT = """
+    redis.replicate_commands()
+    local limit, period, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local time = redis.call('TIME')
+    local now = time[1] * 1000 + math.floor(time[2] / 1000)
+    local rate = limit / period
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or limit
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(limit, tokens + math.max(now - updated_at, 0) * rate)
+    if tokens < cost then
+        return {0, math.floor(tokens), math.ceil((limit - tokens) / rate), math.ceil((cost - tokens) / rate)}
+    end
+    tokens = tokens - cost
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(period))
+    return {1, math.floor(tokens), math.ceil((limit - tokens) / rate), 0}
+    """
+
+
+ALGORITHMS: Dict[str, Type[RateLimitAlgorithm]] = {
+    "fixed_window": FixedWindow,
+    "sliding_window_log": SlidingWindowLog,
+    "sliding_window_counter": SlidingWindowCounter,
+    "token_bucket": TokenBucket,
+}
+
+
+class _Lease:
+    __slots__ = ("units", "expires_at", "result", "leased_at")
+
+    def __init__(self, units: int, expires_at: float, result: RateLimitResult):
+        self.units = units
+        self.expires_at = expires_at
+        # What Redis answered when the units were leased, for the headers.
+        self.result = result
+        self.leased_at = time.monotonic()
+
+
+class LocalLeases:
+    """
+    Bounded LRU of the units each worker leased from Redis in blocks, per rate limit key,
+    so that requests are counted in process until their key's lease runs out.
+
+    Leased units are counted in Redis up front, which bounds the error to one block per
+    worker and key: units held by a worker can't be used by the others until its lease
+    expires, and units leased late in a window can still be spent for up to the lease
+    TTL once it's over. Denials are kept too, until the client may retry or the lease
+    would expire, so limited clients don't reach Redis either.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: int) -> Optional[RateLimitResult]:
+        """
+        Spend `cost` leased units of `key`.
+
+        :return: The outcome of the request, or None when it must go to Redis.
+        """
+        now = time.monotonic()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is None:
+                return None
+            if lease.expires_at <= now:
+                del self._leases[key]
+                return None
+            if lease.result.allowed and lease.units < cost:
+                return None
+            self._leases.move_to_end(key)
+            elapsed = now - lease.leased_at
+            if not lease.result.allowed:
+                return lease.result._replace(
+                    reset=max(lease.result.reset - elapsed, 0),
+                    retry_after=max(lease.result.retry_after - elapsed, 0),
+                )
+            lease.units -= cost
+            return lease.result._replace(
+                remaining=lease.result.remaining + lease.units, reset=max(lease.result.reset - elapsed, 0)
+            )
+
+    def grant(self, key: str, units: int, result: RateLimitResult, ttl: float) -> RateLimitResult:
+        """
+        Add units leased from Redis to the lease of `key`.
+
+        :return: The outcome of the request the units were leased for.
+        """
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.result.allowed and lease.expires_at > time.monotonic():
+                units += lease.units
+            self._store(key, _Lease(units, time.monotonic() + ttl, result))
+        return result._replace(remaining=result.remaining + units)
+
+    def deny(self, key: str, result: RateLimitResult, ttl: float) -> None:
+        """
+        Remember that Redis denied `key`, for at most `ttl` seconds.
+        """
+        with self._lock:
+            self._store(key, _Lease(0, time.monotonic() + min(result.retry_after, ttl), result))
+
+    def _store(self, key: str, lease: _Lease) -> None:
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_size:
+            self._leases.popitem(last=False)
+
+
+class RateLimitPolicy:
+    """
+    How requests matching some URL names and methods are limited: `limit` units per `period`
+    seconds, each request costing `cost` units, counted per client IP or per authenticated user.
+
+    With a `lease`, each worker takes that many units at once from Redis and spends them in
+    process for up to `lease_ttl` seconds, trading a bounded error for fewer round trips.
+    """
+    KEY = "rate_limit:{name}:{identity}"
+
+    def __init__(
+            self,
+            name: str,
+            algorithm: str,
+            limit: int,
+            period: int,
+            key: str = "ip",
+            cost: int = 1,
+            url_names: Optional[Iterable[str]] = None,
+            methods: Optional[Iterable[str]] = None,
+            lease: int = 0,
+            lease_ttl: float = 1.0,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm {algorithm!r}, expected one of {sorted(ALGORITHMS)}.")
+        if key not in ("ip", "user"):
+            raise ValueError(f"Unknown rate limit key {key!r}, expected 'ip' or 'user'.")
+        self.name = name
+        self.algorithm = ALGORITHMS[algorithm]()
+        self.limit = limit
+        self.period = period
+        self.key = key
+        self.cost = cost
+        self.url_names = frozenset(url_names) if url_names is not None else None
+        self.methods = frozenset(method.upper() for method in methods) if methods is not None else None
+        self.lease = lease if lease > cost else 0
+        self.lease_ttl = lease_ttl
+
+    def matches(self, url_name: Optional[str], method: str) -> bool:
+        return (self.url_names is None or url_name in self.url_names) and (
+            self.methods is None or method in self.methods
+        )
+
+    def hit(self, identity: str, leases: Optional[LocalLeases] = None) -> RateLimitResult:
+        """
+        Count a request of the client, against its local lease when leases are enabled.
+        """
+        key = cache.make_key(self.KEY.format(name=self.name, identity=identity))
+        if not self.lease or leases is None:
+            return self.algorithm.hit(key, self.limit, self.period, self.cost)
+
+        result = leases.take(key, self.cost)
+        if result is not None:
+            return result
+        result = self.algorithm.hit(key, self.limit, self.period, self.lease)
+        if result.allowed:
+            return leases.grant(key, self.lease - self.cost, result, self.lease_ttl)
+        # Close to the limit, a whole block may not be left while the request alone fits.
+        result = self.algorithm.hit(key, self.limit, self.period, self.cost)
+        if not result.allowed:
+            leases.deny(key, result, self.lease_ttl)
+        return result
+
+    def headers(self, result: RateLimitResult) -> Dict[str, str]:
+        """
+        The `RateLimit-*` headers describing the policy and the client's quota.
+        """
+        headers = {
+            "RateLimit-Policy": f"{self.limit};w={self.period}",
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(result.remaining),
+            "RateLimit-Reset": str(math.ceil(result.reset)),
+        }
+        if not result.allowed:
+            headers["Retry-After"] = str(math.ceil(result.retry_after))
+        return headers
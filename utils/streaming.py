@@ -0,0 +1,40 @@
+from typing import Any, Callable, Iterable, Iterator
+
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def stream_json_array(
+        items: Iterable,
+        serialize: Callable[[Any], Any],
+        buffer_size: int = 8192
+) -> Iterator[bytes]:
+    """
+    Incrementally encode `items` as a JSON array, with the same encoding options as
+    DRF's `JSONRenderer`, yielding chunks of roughly `buffer_size` bytes.
+
+    :param items: The objects to encode, consumed lazily.
+    :param serialize: A callable turning one item into JSON-serializable data.
+    :param buffer_size: The approximate size of each yielded chunk.
+    """
+    encoder = JSONEncoder(
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON,
+        separators=(",", ":"),
+    )
+    buffer = [b"["]
+    buffered = 1
+    separator = b""
+
+    for item in items:
+        chunk = separator + encoder.encode(serialize(item)).encode()
+        separator = b","
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+
+    buffer.append(b"]")
+    yield b"".join(buffer)